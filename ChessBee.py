@@ -1,36 +1,57 @@
 import pygame
+from datetime import date
+from src.engine.pgn import game_from_board, write_game
 from src.ui.components import BoardComponent
-from src.ui.color import Color
 from src.ui.text import Text
 from src.ui.window import Window
 
-WINDOW = pygame.display.set_mode(Window.SIZE)
-pygame.display.set_caption(Window.TITLE)
+WINDOW = None
+BOARD = None
+# Every game played is added to the end of this file
+PGN_PATH = "ChessBee.pgn"
 
-BOARD = BoardComponent(WINDOW)
+def create_window():
+    """Opens the window and sets up the board. Done on start rather than
+    on import, so that importing this module stays cheap."""
+    global WINDOW, BOARD
+    WINDOW = pygame.display.set_mode(Window.SIZE)
+    pygame.display.set_caption(Window.TITLE)
+    BOARD = BoardComponent(WINDOW)
 
 def draw_window():
-    WINDOW.fill(Color.BLACK)
-    BOARD.draw()
-    pygame.display.update()
+    dirty = BOARD.draw()
+    if dirty:
+        pygame.display.update(dirty)
+
+def save_game():
+    """Appends the moves played so far to PGN_PATH."""
+    if not BOARD.board.history:
+        return
+    game = game_from_board(BOARD.board, {"Event": "ChessBee game",
+                                         "Site": "ChessBee",
+                                         "Date": date.today().strftime("%Y.%m.%d")})
+    with open(PGN_PATH, "a") as stream:
+        write_game(stream, game)
 
 def main():
-    clock = pygame.time.Clock()
+    create_window()
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
     run = True
     while run:
-        clock.tick(Window.FPS)
-        for event in pygame.event.get():
+        # Sleep until there is input, waking up now and then regardless
+        events = [pygame.event.wait(Window.EVENT_TIMEOUT)]
+        events += pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 run = False
                 continue
+            if event.type == pygame.VIDEOEXPOSE:
+                BOARD.invalidate()
+                continue
             if event.type == pygame.MOUSEBUTTONUP:
-                pos = pygame.mouse.get_pos()
-                squares = [square for rank in BOARD.squares
-                           for square in rank
-                           if square.rect.collidepoint(pos)]
-                if not squares:
+                square_component = BOARD.square_at_point(event.pos)
+                if square_component is None:
                     continue
-                square_component = squares[0]
                 if square_component.selected:
                     BOARD.clear_colors()
                     continue
@@ -40,7 +61,6 @@ def main():
                 if square_component.highlighted:
                     old_square = BOARD.selected_square_pos
                     BOARD.board.move_piece(old_square, square)
-                    BOARD.board.change_turn()
                     BOARD.clear_colors()
                     status = BOARD.board.game_status()
                     if status:
@@ -53,6 +73,7 @@ def main():
                     for move in moves:
                         BOARD.hl_square_at(move.rank, move.file)
         draw_window()
+    save_game()
     pygame.quit()
 
 
@@ -0,0 +1,139 @@
+# Attack tables built once at import. Squares are indexed 0-63 from a1
+# (see src.engine.bitboard), so stepping up the board adds 8 and stepping
+# right adds 1.
+
+# Opposite directions differ only in their lowest bit
+UP, DOWN, LEFT, RIGHT, UP_LEFT, DOWN_RIGHT, UP_RIGHT, DOWN_LEFT = range(8)
+STEPS = ((0, 1), (0, -1), (-1, 0), (1, 0), (-1, 1), (1, -1), (1, 1), (-1, -1))
+KNIGHT_STEPS = ((1, 2), (2, 1), (2, -1), (1, -2),
+                (-1, -2), (-2, -1), (-2, 1), (-1, 2))
+KING_STEPS = STEPS
+
+
+def _leaper_attacks(index: int, steps: tuple) -> int:
+    rank = index & 7
+    file = index >> 3
+    attacks = 0
+    for rank_step, file_step in steps:
+        new_rank = rank + rank_step
+        new_file = file + file_step
+        if 0 <= new_rank < 8 and 0 <= new_file < 8:
+            attacks |= 1 << (new_file*8 + new_rank)
+    return attacks
+
+
+def _ray(index: int, direction: int) -> int:
+    rank_step, file_step = STEPS[direction]
+    rank = (index & 7) + rank_step
+    file = (index >> 3) + file_step
+    ray = 0
+    while 0 <= rank < 8 and 0 <= file < 8:
+        ray |= 1 << (file*8 + rank)
+        rank += rank_step
+        file += file_step
+    return ray
+
+
+KNIGHT_ATTACKS = tuple(_leaper_attacks(index, KNIGHT_STEPS)
+                       for index in range(64))
+KING_ATTACKS = tuple(_leaper_attacks(index, KING_STEPS)
+                     for index in range(64))
+# Indexed by color value, then square
+PAWN_ATTACKS = (tuple(_leaper_attacks(index, ((-1, 1), (1, 1)))
+                      for index in range(64)),
+                tuple(_leaper_attacks(index, ((-1, -1), (1, -1)))
+                      for index in range(64)))
+
+# Indexed by direction, then square. Every square along a direction up to
+# the edge of the board.
+RAYS = tuple(tuple(_ray(index, direction) for index in range(64))
+             for direction in range(8))
+UP_RAYS = RAYS[UP]
+DOWN_RAYS = RAYS[DOWN]
+LEFT_RAYS = RAYS[LEFT]
+RIGHT_RAYS = RAYS[RIGHT]
+UP_LEFT_RAYS = RAYS[UP_LEFT]
+UP_RIGHT_RAYS = RAYS[UP_RIGHT]
+DOWN_LEFT_RAYS = RAYS[DOWN_LEFT]
+DOWN_RIGHT_RAYS = RAYS[DOWN_RIGHT]
+
+# Attacks on an empty board
+BISHOP_MASKS = tuple(UP_LEFT_RAYS[index] | UP_RIGHT_RAYS[index] |
+                     DOWN_LEFT_RAYS[index] | DOWN_RIGHT_RAYS[index]
+                     for index in range(64))
+ROOK_MASKS = tuple(UP_RAYS[index] | DOWN_RAYS[index] |
+                   LEFT_RAYS[index] | RIGHT_RAYS[index]
+                   for index in range(64))
+QUEEN_MASKS = tuple(BISHOP_MASKS[index] | ROOK_MASKS[index]
+                    for index in range(64))
+
+
+# Rays towards higher squares are cut at their lowest blocker and rays
+# towards lower squares at their highest, by removing the blocker's own ray
+# in the same direction.
+
+def bishop_attacks(index: int, occupied: int) -> int:
+    up_left = UP_LEFT_RAYS[index]
+    blockers = up_left & occupied
+    if blockers:
+        up_left ^= UP_LEFT_RAYS[(blockers & -blockers).bit_length() - 1]
+    up_right = UP_RIGHT_RAYS[index]
+    blockers = up_right & occupied
+    if blockers:
+        up_right ^= UP_RIGHT_RAYS[(blockers & -blockers).bit_length() - 1]
+    down_left = DOWN_LEFT_RAYS[index]
+    blockers = down_left & occupied
+    if blockers:
+        down_left ^= DOWN_LEFT_RAYS[blockers.bit_length() - 1]
+    down_right = DOWN_RIGHT_RAYS[index]
+    blockers = down_right & occupied
+    if blockers:
+        down_right ^= DOWN_RIGHT_RAYS[blockers.bit_length() - 1]
+    return up_left | up_right | down_left | down_right
+
+
+def rook_attacks(index: int, occupied: int) -> int:
+    up = UP_RAYS[index]
+    blockers = up & occupied
+    if blockers:
+        up ^= UP_RAYS[(blockers & -blockers).bit_length() - 1]
+    right = RIGHT_RAYS[index]
+    blockers = right & occupied
+    if blockers:
+        right ^= RIGHT_RAYS[(blockers & -blockers).bit_length() - 1]
+    down = DOWN_RAYS[index]
+    blockers = down & occupied
+    if blockers:
+        down ^= DOWN_RAYS[blockers.bit_length() - 1]
+    left = LEFT_RAYS[index]
+    blockers = left & occupied
+    if blockers:
+        left ^= LEFT_RAYS[blockers.bit_length() - 1]
+    return up | right | down | left
+
+
+def queen_attacks(index: int, occupied: int) -> int:
+    return bishop_attacks(index, occupied) | rook_attacks(index, occupied)
+
+
+def _between_and_line() -> tuple:
+    between = [[0]*64 for _ in range(64)]
+    line = [[0]*64 for _ in range(64)]
+    for index in range(64):
+        for direction in range(8):
+            opposite = direction ^ 1
+            full_line = (RAYS[direction][index] | RAYS[opposite][index] |
+                         1 << index)
+            for target in range(64):
+                if RAYS[direction][index] >> target & 1:
+                    between[index][target] = (RAYS[direction][index] ^
+                                              RAYS[direction][target] ^
+                                              1 << target)
+                    line[index][target] = full_line
+    return (tuple(tuple(row) for row in between),
+            tuple(tuple(row) for row in line))
+
+
+# Indexed by two squares. BETWEEN holds the squares strictly between them
+# and LINE the whole line through both, or 0 if they share no line.
+BETWEEN, LINE = _between_and_line()
@@ -0,0 +1,49 @@
+from typing import Iterable
+import numpy as np
+from src.engine.board import Board
+from src.engine.pst import MG_SCORES, EG_SCORES, PHASE_WEIGHTS, MAX_PHASE
+
+# Scores many positions at once with NumPy. Positions are 12x64 tensors of
+# piece placement, one plane per piece code with a1 first, and are scored
+# by material plus piece-square tables as in src.engine.pst. Only this
+# module needs NumPy; the search does not import it.
+
+MG_ARRAY = np.array(MG_SCORES, dtype=np.int32)
+EG_ARRAY = np.array(EG_SCORES, dtype=np.int32)
+PHASE_ARRAY = np.array(PHASE_WEIGHTS*2, dtype=np.int32)
+
+
+def tensor_from_bitboards(pieces: np.ndarray) -> np.ndarray:
+    """Unpacks an (N, 12) array of piece bitboards, indexed by piece code,
+    into an (N, 12, 64) tensor of zeros and ones."""
+    pieces = np.ascontiguousarray(pieces, dtype="<u8")
+    bits = np.unpackbits(pieces.view(np.uint8), bitorder="little")
+    return bits.reshape(len(pieces), 12, 64)
+
+
+def boards_to_tensor(boards: Iterable[Board]) -> np.ndarray:
+    """Returns the (N, 12, 64) placement tensor of some boards."""
+    pieces = np.array([board.bitboards.pieces for board in boards],
+                      dtype=np.uint64).reshape(-1, 12)
+    return tensor_from_bitboards(pieces)
+
+
+def evaluate_tensor(tensor: np.ndarray) -> np.ndarray:
+    """Scores an (N, 12, 64) placement tensor in one go, returning each
+    position's score in centipawns from white's point of view."""
+    tensor = tensor.astype(np.int32, copy=False)
+    mg = np.einsum("npq,pq->n", tensor, MG_ARRAY)
+    eg = np.einsum("npq,pq->n", tensor, EG_ARRAY)
+    phase = np.minimum(tensor.sum(axis=2) @ PHASE_ARRAY, MAX_PHASE)
+    return (mg*phase + eg*(MAX_PHASE - phase)) // MAX_PHASE
+
+
+def evaluate_bitboards(pieces: np.ndarray) -> np.ndarray:
+    """Scores an (N, 12) array of piece bitboards, as from a position
+    dump, from white's point of view."""
+    return evaluate_tensor(tensor_from_bitboards(pieces))
+
+
+def evaluate_boards(boards: Iterable[Board]) -> np.ndarray:
+    """Scores some boards from white's point of view."""
+    return evaluate_tensor(boards_to_tensor(boards))
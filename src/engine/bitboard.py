@@ -0,0 +1,188 @@
+from typing import Iterator
+from src.engine.piece import (
+    Piece, PieceColor, Pawn, Knight, Bishop, Rook, Queen, King )
+from src.engine.attacks import (
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, bishop_attacks, rook_attacks,
+    queen_attacks )
+
+# Squares are indexed 0-63 from a1, so a1 is 0, h1 is 7 and h8 is 63.
+# As with BoardPosition, a "rank" is a lettered column and a "file" is a
+# numbered row.
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
+KIND_OF = {cls: kind for kind, cls in enumerate(PIECE_CLASSES)}
+
+WHITE = PieceColor.WHITE.value
+BLACK = PieceColor.BLACK.value
+COLORS = (PieceColor.WHITE, PieceColor.BLACK)
+
+EMPTY = -1
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_1 = 0xFF
+FILE_2 = FILE_1 << 8
+FILE_3 = FILE_1 << 16
+FILE_6 = FILE_1 << 40
+FILE_7 = FILE_1 << 48
+FILE_8 = FILE_1 << 56
+
+
+def piece_code(color: int, kind: int) -> int:
+    """Returns the index of a color and piece kind in Bitboards.pieces."""
+    return color*6 + kind
+
+
+def code_of(piece: Piece) -> int:
+    return piece.color.value*6 + KIND_OF[piece.__class__]
+
+
+def square_index(rank: chr, file: int) -> int:
+    return (file-1)*8 + ord(rank) - ord('a')
+
+
+def square_name(index: int) -> str:
+    return f"{chr(ord('a') + (index & 7))}{(index >> 3) + 1}"
+
+
+def lsb_index(bb: int) -> int:
+    return (bb & -bb).bit_length() - 1
+
+
+def iter_bits(bb: int) -> Iterator[int]:
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def pawn_pushes(bb: int, color: int) -> int:
+    if color == WHITE:
+        return (bb << 8) & FULL
+    return bb >> 8
+
+
+class Bitboards:
+    """Stores a position as one bitboard per piece kind and color, plus
+    occupancy masks, a square-to-piece lookup and the squares attacked from
+    each square."""
+    __slots__ = ("pieces", "colors", "occupied", "mailbox", "attacks",
+                 "attack_maps")
+
+    def __init__(self) -> None:
+        self.clear()
+
+    def __str__(self) -> str:
+        rows = []
+        for file in range(7, -1, -1):
+            row = []
+            for rank in range(8):
+                code = self.mailbox[file*8 + rank]
+                if code == EMPTY:
+                    row.append(".")
+                    continue
+                char = PIECE_CLASSES[code % 6].fen_char
+                row.append(char.upper() if code < 6 else char.lower())
+            rows.append(" ".join(row))
+        return "\n".join(rows)
+
+    def clear(self) -> None:
+        self.pieces = [0]*12
+        self.colors = [0, 0]
+        self.occupied = 0
+        self.mailbox = [EMPTY]*64
+        self.attacks = [0]*64
+        self.attack_maps = [0, 0]
+
+    def put(self, code: int, index: int) -> None:
+        bb = 1 << index
+        self.pieces[code] |= bb
+        self.colors[code // 6] |= bb
+        self.occupied |= bb
+        self.mailbox[index] = code
+
+    def remove(self, index: int) -> int:
+        code = self.mailbox[index]
+        bb = 1 << index
+        self.pieces[code] ^= bb
+        self.colors[code // 6] ^= bb
+        self.occupied ^= bb
+        self.mailbox[index] = EMPTY
+        return code
+
+    def move(self, start: int, end: int) -> None:
+        """Moves the piece on start to the empty square end."""
+        code = self.mailbox[start]
+        bb = (1 << start) | (1 << end)
+        self.pieces[code] ^= bb
+        self.colors[code // 6] ^= bb
+        self.occupied ^= bb
+        self.mailbox[start] = EMPTY
+        self.mailbox[end] = code
+
+    def refresh_attacks(self, changed: int) -> None:
+        """Updates the stored attacks after the squares in changed gained or
+        lost a piece.
+
+        Only the pieces on changed squares and the sliders whose rays reached
+        one of them are recomputed. A slider whose attacks change must have
+        reached the nearest changed square along that ray beforehand, so the
+        stored attacks are enough to find them."""
+        attacks = self.attacks
+        mailbox = self.mailbox
+        pieces = self.pieces
+        sliders = (pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN] |
+                   pieces[6 + BISHOP] | pieces[6 + ROOK] | pieces[6 + QUEEN])
+        stale = changed
+        for index in iter_bits(sliders & ~changed):
+            if attacks[index] & changed:
+                stale |= 1 << index
+        for index in iter_bits(stale):
+            code = mailbox[index]
+            attacks[index] = 0 if code == EMPTY else self.attacks_from(code, index)
+        self.attack_maps = [None, None]
+
+    def attack_map(self, color: int) -> int:
+        """Returns every square attacked by color."""
+        attack_map = self.attack_maps[color]
+        if attack_map is None:
+            attack_map = 0
+            attacks = self.attacks
+            for index in iter_bits(self.colors[color]):
+                attack_map |= attacks[index]
+            self.attack_maps[color] = attack_map
+        return attack_map
+
+    def king_index(self, color: int) -> int:
+        return lsb_index(self.pieces[color*6 + KING])
+
+    def attacks_from(self, code: int, index: int) -> int:
+        """Returns the squares attacked by the piece code standing on index."""
+        kind = code % 6
+        if kind == PAWN:
+            return PAWN_ATTACKS[code // 6][index]
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[index]
+        if kind == BISHOP:
+            return bishop_attacks(index, self.occupied)
+        if kind == ROOK:
+            return rook_attacks(index, self.occupied)
+        if kind == QUEEN:
+            return queen_attacks(index, self.occupied)
+        return KING_ATTACKS[index]
+
+    def attackers_to(self, index: int, occupied: int) -> int:
+        """Returns the pieces of both colors attacking index, treating
+        occupied as the set of blocking squares. Rays are cast outward from
+        index rather than generated from every piece."""
+        pieces = self.pieces
+        diagonal = (pieces[BISHOP] | pieces[QUEEN] |
+                    pieces[6 + BISHOP] | pieces[6 + QUEEN])
+        straight = (pieces[ROOK] | pieces[QUEEN] |
+                    pieces[6 + ROOK] | pieces[6 + QUEEN])
+        return (PAWN_ATTACKS[BLACK][index] & pieces[PAWN] |
+                PAWN_ATTACKS[WHITE][index] & pieces[6 + PAWN] |
+                KNIGHT_ATTACKS[index] & (pieces[KNIGHT] | pieces[6 + KNIGHT]) |
+                KING_ATTACKS[index] & (pieces[KING] | pieces[6 + KING]) |
+                bishop_attacks(index, occupied) & diagonal |
+                rook_attacks(index, occupied) & straight)
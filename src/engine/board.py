@@ -1,23 +1,38 @@
+import warnings
+from array import array
 from typing import List
 from src.engine.piece import (
     Piece, PieceColor, Pawn, Knight, Bishop, Rook, Queen, King )
+from src.engine.bitboard import (
+    Bitboards, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PIECE_CLASSES, KIND_OF,
+    WHITE, BLACK, COLORS, EMPTY, FULL, FILE_1, FILE_2, FILE_3, FILE_6, FILE_7,
+    FILE_8, code_of, piece_code, square_index, square_name, lsb_index,
+    iter_bits, pawn_pushes )
+from src.engine.attacks import (
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, BISHOP_MASKS, ROOK_MASKS,
+    BETWEEN, LINE, bishop_attacks, rook_attacks, queen_attacks )
+from src.engine.move import MoveFlag, new_move_buffer
+from src.engine.zobrist import (
+    PIECE_KEYS, SIDE_KEY, CASTLING_KEYS, EP_KEYS, compute_hash )
+from src.engine.pst import MG_SCORES, EG_SCORES, MATERIAL_SCORES, PHASE_WEIGHTS
 
 
 class BoardPosition:
     """Stores a chess board position's rank, file, and piece (if any)."""
-    __slots__ = ("rank", "file", "piece")
+    __slots__ = ("rank", "file", "piece", "index")
 
     def __init__(self, rank: chr, file: int, piece: Piece = None) -> None:
         self.rank = rank
         self.file = file
-        self.piece = None
+        self.piece = piece
+        self.index = square_index(rank, file)
 
     def __str__(self) -> str:
         # if self.piece:
         #     return str(self.piece)
         # return "."
         return f"{self.rank}{self.file}"
-    
+
     def position(self) -> tuple:
         """Returns the position as a (character, integer) tuple."""
         return (self.rank, self.file)
@@ -27,450 +42,771 @@ class GameStatus:
     PLAY = 0
     CHECKMATE = 1
     STALEMATE = 2
+    REPETITION = 3
+    FIFTY_MOVES = 4
+
+
+class CastlingRights:
+    WHITE_KINGSIDE = 1
+    WHITE_QUEENSIDE = 2
+    BLACK_KINGSIDE = 4
+    BLACK_QUEENSIDE = 8
+    ALL = 15
+
+
+# Castling rights that survive a move touching each square.
+CASTLING_MASK = [CastlingRights.ALL]*64
+CASTLING_MASK[0] ^= CastlingRights.WHITE_QUEENSIDE
+CASTLING_MASK[4] ^= (CastlingRights.WHITE_KINGSIDE |
+                     CastlingRights.WHITE_QUEENSIDE)
+CASTLING_MASK[7] ^= CastlingRights.WHITE_KINGSIDE
+CASTLING_MASK[56] ^= CastlingRights.BLACK_QUEENSIDE
+CASTLING_MASK[60] ^= (CastlingRights.BLACK_KINGSIDE |
+                      CastlingRights.BLACK_QUEENSIDE)
+CASTLING_MASK[63] ^= CastlingRights.BLACK_KINGSIDE
+
+FEN_KINDS = {cls.fen_char.lower(): kind for kind, cls in enumerate(PIECE_CLASSES)}
+FEN_CASTLING = (("K", CastlingRights.WHITE_KINGSIDE),
+                ("Q", CastlingRights.WHITE_QUEENSIDE),
+                ("k", CastlingRights.BLACK_KINGSIDE),
+                ("q", CastlingRights.BLACK_QUEENSIDE))
+# The squares the king and rook of each castling right start on
+CASTLING_SQUARES = ((CastlingRights.WHITE_KINGSIDE, 4, 7),
+                    (CastlingRights.WHITE_QUEENSIDE, 4, 0),
+                    (CastlingRights.BLACK_KINGSIDE, 60, 63),
+                    (CastlingRights.BLACK_QUEENSIDE, 60, 56))
+
+
+def fen_of(mailbox: list, color: int, castling: int, ep_square: int,
+           halfmove_clock: int = 0, fullmove: int = 1) -> str:
+    """Writes the FEN of a position given as a square-to-piece-code list
+    and the state of the side to move."""
+    rows = []
+    for file in range(7, -1, -1):
+        row = ""
+        empty = 0
+        for index in range(file*8, file*8 + 8):
+            code = mailbox[index]
+            if code == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            char = PIECE_CLASSES[code % 6].fen_char
+            row += char.upper() if code < 6 else char.lower()
+        if empty:
+            row += str(empty)
+        rows.append(row)
+    castling = "".join(char for char, right in FEN_CASTLING
+                       if castling & right) or "-"
+    ep = "-" if ep_square is None else square_name(ep_square)
+    turn = "w" if color == WHITE else "b"
+    return f"{'/'.join(rows)} {turn} {castling} {ep} {halfmove_clock} {fullmove}"
 
 
 class Board:
     """Store information on the location of each piece."""
-    __slots__ = ("squares", "current_turn", "current_move")
-    
+    __slots__ = ("squares", "positions", "bitboards", "castling",
+                 "ep_square", "halfmove_clock", "hash", "history",
+                 "current_turn", "current_move", "legal_cache", "material",
+                 "mg_score", "eg_score", "phase", "prior_keys")
+
     def __init__(self):
         self.squares = tuple(tuple(BoardPosition(rank, file)
                                    for rank in self.all_ranks())
                              for file in self.all_files())
+        self.positions = tuple(square for file in self.squares
+                               for square in file)
+        self.bitboards = Bitboards()
+        # (hash, targets) of the last position legal_targets_by_square ran on
+        self.legal_cache = None
         self.reset_board()
-        self.current_turn = PieceColor.WHITE
-        self.current_move = 0
-        
+
     def __str__(self) -> str:
-        return ("\n".join([" ".join([str(square) for square in rank]) 
+        return ("\n".join([" ".join([str(square.piece) if square.piece else "."
+                                     for square in rank])
             for rank in reversed(self.squares)]))
-    
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "Board":
+        board = cls()
+        board.set_fen(fen)
+        return board
+
+    def set_fen(self, fen: str) -> None:
+        """Sets up the position described by a FEN string. Missing trailing
+        fields default to white to move, no castling or en passant and the
+        first move. Raises ValueError, leaving the board as it was, if the
+        FEN is invalid."""
+        fields = fen.split()
+        if not fields or len(fields) > 6 or len(fields[0].split("/")) != 8:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        fields += ["w", "-", "-", "0", "1"][len(fields) - 1:]
+        placement, turn, castling, ep, halfmove, fullmove = fields
+        mailbox = [EMPTY]*64
+        for row, chars in enumerate(placement.split("/")):
+            index = (7 - row)*8
+            for char in chars:
+                if char in "12345678":
+                    index += int(char)
+                    continue
+                kind = FEN_KINDS.get(char.lower())
+                if kind is None:
+                    raise ValueError(f"Invalid FEN piece {char!r}: {fen!r}")
+                if index < (8 - row)*8:
+                    mailbox[index] = piece_code(
+                        WHITE if char.isupper() else BLACK, kind)
+                index += 1
+            if index != (8 - row)*8:
+                raise ValueError(f"Invalid FEN row {chars!r}: {fen!r}")
+        for color in (WHITE, BLACK):
+            if mailbox.count(piece_code(color, KING)) != 1:
+                raise ValueError(f"FEN needs one king of each color: {fen!r}")
+        if turn not in ("w", "b"):
+            raise ValueError(f"Invalid FEN side to move {turn!r}: {fen!r}")
+        color = WHITE if turn == "w" else BLACK
+        rights = 0
+        if castling != "-":
+            for char in castling:
+                right = dict(FEN_CASTLING).get(char)
+                if right is None:
+                    raise ValueError(f"Invalid FEN castling {castling!r}: {fen!r}")
+                rights |= right
+        for right, king, rook in CASTLING_SQUARES:
+            side = WHITE if king < 8 else BLACK
+            if rights & right and (mailbox[king] != piece_code(side, KING) or
+                                   mailbox[rook] != piece_code(side, ROOK)):
+                raise ValueError(f"Invalid FEN castling {castling!r}, the king "
+                                 f"or rook has moved: {fen!r}")
+        ep_square = None
+        if ep != "-":
+            if (len(ep) != 2 or ep[0] not in "abcdefgh" or
+                    ep[1] != ("6" if color == WHITE else "3")):
+                raise ValueError(f"Invalid FEN en passant square {ep!r}: {fen!r}")
+            index = square_index(ep[0], int(ep[1]))
+            pushed = index - 8 if color == WHITE else index + 8
+            start = index + 8 if color == WHITE else index - 8
+            if (mailbox[pushed] != piece_code(1 - color, PAWN) or
+                    mailbox[index] != EMPTY or mailbox[start] != EMPTY):
+                raise ValueError(f"Invalid FEN en passant square {ep!r}, no "
+                                 f"pawn was pushed past it: {fen!r}")
+            # As in make_move, only keep squares a pawn could capture onto
+            if any(mailbox[square] == piece_code(color, PAWN)
+                   for square in iter_bits(PAWN_ATTACKS[1 - color][index])):
+                ep_square = index
+        if not (halfmove.isdigit() and fullmove.isdigit() and int(fullmove)):
+            raise ValueError(f"Invalid FEN move counters: {fen!r}")
+        halfmove = int(halfmove)
+        fullmove = int(fullmove)
+
+        bitboards = self.bitboards
+        bitboards.clear()
+        for index, code in enumerate(mailbox):
+            square = self.positions[index]
+            square.piece = None
+            if code != EMPTY:
+                bitboards.put(code, index)
+                square.piece = PIECE_CLASSES[code % 6](COLORS[code // 6])
+        self.current_turn = COLORS[color]
+        self.castling = rights
+        self.halfmove_clock = halfmove
+        self.current_move = 2*(fullmove - 1) + color
+        self.ep_square = ep_square
+        self.history = []
+        self.prior_keys = []
+        self.set_piece_flags()
+        bitboards.refresh_attacks(FULL)
+        self.hash = compute_hash(self)
+        self.compute_scores()
+
+    def set_piece_flags(self) -> None:
+        """Derives has_not_moved and last_moved on each Piece from the
+        castling rights and en passant square."""
+        for square in self.positions:
+            piece = square.piece
+            if piece.__class__ is King or piece.__class__ is Rook:
+                # The rights tied to this square, if it is a home square
+                rights = CastlingRights.ALL ^ CASTLING_MASK[square.index]
+                piece.has_not_moved = bool(self.castling & rights)
+            elif piece.__class__ is Pawn:
+                start = FILE_2 if piece.color is PieceColor.WHITE else FILE_7
+                piece.last_moved = -1 if (1 << square.index) & start else 0
+        if self.ep_square is not None:
+            pushed = self.ep_square + (8 if self.current_turn is PieceColor.BLACK else -8)
+            self.positions[pushed].piece.last_moved = self.current_move - 1
+
+    def to_fen(self) -> str:
+        return fen_of(self.bitboards.mailbox, self.current_turn.value,
+                      self.castling, self.ep_square, self.halfmove_clock,
+                      self.current_move // 2 + 1)
+
     def all_ranks(self) -> tuple():
         return tuple(chr(ord('a')+i) for i in range(8))
-    
+
     def all_files(self) -> tuple():
         return tuple(i+1 for i in range(8))
-    
+
     def print_squares(self) -> None:
-        print("\n".join([" ".join([str(square) for square in rank]) 
+        print("\n".join([" ".join([str(square) for square in rank])
             for rank in reversed(self.squares)]))
-        
+
     def square_at(self, rank: chr, file: int) -> BoardPosition:
-        rank = ord(rank)-ord('a')
-        file = file-1
-        return self.squares[file][rank]
+        return self.positions[square_index(rank, file)]
 
     def place_piece_at(self, piece: Piece, rank: chr, file: int) -> bool:
         square = self.square_at(rank, file)
-        return square.set_piece(piece)
+        if square.piece:
+            code = self.bitboards.remove(square.index)
+            self.hash ^= PIECE_KEYS[code][square.index]
+            self.update_scores(code, square.index, -1)
+        square.piece = piece
+        if piece:
+            self.bitboards.put(code_of(piece), square.index)
+            self.hash ^= PIECE_KEYS[code_of(piece)][square.index]
+            self.update_scores(code_of(piece), square.index, 1)
+        self.bitboards.refresh_attacks(1 << square.index)
+        return True
+
+    def update_scores(self, code: int, index: int, sign: int) -> None:
+        """Adds (sign 1) or takes away (sign -1) a piece's share of the
+        running material, piece-square and phase totals."""
+        self.material += sign*MATERIAL_SCORES[code]
+        self.mg_score += sign*MG_SCORES[code][index]
+        self.eg_score += sign*EG_SCORES[code][index]
+        self.phase += sign*PHASE_WEIGHTS[code % 6]
+
+    def compute_scores(self) -> None:
+        """Works out the running totals of update_scores from scratch."""
+        self.material = self.mg_score = self.eg_score = self.phase = 0
+        for index, code in enumerate(self.bitboards.mailbox):
+            if code != EMPTY:
+                self.update_scores(code, index, 1)
 
-    def move_piece(self, old: BoardPosition, new: BoardPosition) -> None:
+    def move_piece(self, old: BoardPosition, new: BoardPosition,
+                   promotion: type = Queen) -> None:
+        """Plays a move for the side to move, keeping the pieces stored on
+        each BoardPosition in step with the bitboards, and passes the turn
+        to the other side."""
+        start = old.index
+        end = new.index
         piece = old.piece
-        # If this is en passant, remove the pawn at the old position
+        kind = None
         if piece.__class__ is Pawn:
-            if not old.rank == new.rank and not new.piece:
+            if (1 << end) & (FILE_1 | FILE_8):
+                kind = KIND_OF[promotion]
+            # If this is en passant, remove the pawn at the old position
+            if (1 << end) & self.ep_targets(piece.color.value):
                 self.square_at(new.rank, old.file).piece = None
         # If this is castling, move both the king and rook
-        if piece.__class__ is King:
-            rank_diff = ord(new.rank) - ord(old.rank)
-            if rank_diff == -2:
-                # Castling queenside
-                self.square_at('a', old.file).piece = None
-                self.square_at('d', old.file).piece = Rook(piece.color, False)
-            elif rank_diff == 2:
-                # Castling kingside
-                self.square_at('h', old.file).piece = None
-                self.square_at('f', old.file).piece = Rook(piece.color, False)
+        if piece.__class__ is King and abs(end - start) == 2:
+            if end > start:
+                rook_old = self.positions[start + 3]
+                rook_new = self.positions[start + 1]
+            else:
+                rook_old = self.positions[start - 4]
+                rook_new = self.positions[start - 1]
+            rook_old.piece.move(self.current_move)
+            rook_new.piece = rook_old.piece
+            rook_old.piece = None
         piece.move(self.current_move)
-        new.piece = old.piece
+        new.piece = piece if kind is None else promotion(piece.color)
         old.piece = None
+        self.make_move(self.encode_move(start, end, kind))
+        self.legal_cache = None
+
+    def encode_move(self, start: int, end: int, promotion: int = None) -> int:
+        """Packs a move from start to end in the current position, working
+        out its MoveFlag."""
+        code = self.bitboards.mailbox[start]
+        kind = code % 6
+        flag = MoveFlag.NONE
+        if promotion is not None:
+            flag = MoveFlag.PROMOTION | promotion
+        elif kind == PAWN:
+            if (1 << end) & self.ep_targets(code // 6):
+                flag = MoveFlag.EN_PASSANT
+            elif abs(end - start) == 16:
+                flag = MoveFlag.DOUBLE_PUSH
+        elif kind == KING and abs(end - start) == 2:
+            flag = MoveFlag.CASTLING
+        return start | end << 6 | flag << 12
+
+    def make_move(self, move: int) -> tuple:
+        """Plays a packed move on the bitboards and passes the turn. The
+        BoardPosition pieces are left untouched.
+
+        Returns the undo record pushed onto the history: the move, the
+        captured piece code, and the castling rights, en passant square,
+        halfmove clock, hash and running scores from before the move."""
+        start = move & 63
+        end = move >> 6 & 63
+        flag = move >> 12
+        bitboards = self.bitboards
+        mailbox = bitboards.mailbox
+        code = mailbox[start]
+        color = code // 6
+        captured = mailbox[end]
+        key = self.hash ^ SIDE_KEY ^ PIECE_KEYS[code][start]
+        scores = (self.material, self.mg_score, self.eg_score, self.phase)
+        mg = self.mg_score - MG_SCORES[code][start]
+        eg = self.eg_score - EG_SCORES[code][start]
+        changed = (1 << start) | (1 << end)
+        captured_at = end
+        if captured != EMPTY:
+            bitboards.remove(end)
+        elif flag == MoveFlag.EN_PASSANT:
+            captured_at = end - 8 if color == WHITE else end + 8
+            captured = bitboards.remove(captured_at)
+            changed |= 1 << captured_at
+        if captured != EMPTY:
+            key ^= PIECE_KEYS[captured][captured_at]
+            mg -= MG_SCORES[captured][captured_at]
+            eg -= EG_SCORES[captured][captured_at]
+            self.material -= MATERIAL_SCORES[captured]
+            self.phase -= PHASE_WEIGHTS[captured % 6]
+        undo = (move, captured, self.castling, self.ep_square,
+                self.halfmove_clock, self.hash, scores)
+        if flag == MoveFlag.CASTLING:
+            rook_start, rook_end = ((start + 3, start + 1) if end > start
+                                    else (start - 4, start - 1))
+            bitboards.move(rook_start, rook_end)
+            rook = piece_code(color, ROOK)
+            key ^= PIECE_KEYS[rook][rook_start] ^ PIECE_KEYS[rook][rook_end]
+            mg += MG_SCORES[rook][rook_end] - MG_SCORES[rook][rook_start]
+            eg += EG_SCORES[rook][rook_end] - EG_SCORES[rook][rook_start]
+            changed |= (1 << rook_start) | (1 << rook_end)
+        bitboards.move(start, end)
+        if flag & MoveFlag.PROMOTION:
+            promoted = piece_code(color, flag & 7)
+            bitboards.remove(end)
+            bitboards.put(promoted, end)
+            key ^= PIECE_KEYS[promoted][end]
+            mg += MG_SCORES[promoted][end]
+            eg += EG_SCORES[promoted][end]
+            self.material += MATERIAL_SCORES[promoted] - MATERIAL_SCORES[code]
+            self.phase += PHASE_WEIGHTS[flag & 7]
+        else:
+            key ^= PIECE_KEYS[code][end]
+            mg += MG_SCORES[code][end]
+            eg += EG_SCORES[code][end]
+        self.mg_score = mg
+        self.eg_score = eg
+        if self.ep_square is not None:
+            key ^= EP_KEYS[self.ep_square & 7]
+        self.ep_square = None
+        # Only record en passant squares an enemy pawn could capture onto,
+        # so the hash does not tell apart otherwise identical positions
+        if (flag == MoveFlag.DOUBLE_PUSH and
+                PAWN_ATTACKS[color][(start + end) >> 1] &
+                bitboards.pieces[piece_code(1 - color, PAWN)]):
+            self.ep_square = (start + end) >> 1
+            key ^= EP_KEYS[end & 7]
+        castling = self.castling & CASTLING_MASK[start] & CASTLING_MASK[end]
+        key ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+        self.castling = castling
+        self.hash = key
+        if code % 6 == PAWN or captured != EMPTY:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        bitboards.refresh_attacks(changed)
         self.current_move += 1
+        self.current_turn = COLORS[1 - color]
+        self.history.append(undo)
+        return undo
+
+    def unmake_move(self) -> tuple:
+        """Takes back the last move played with make_move and returns its
+        undo record."""
+        undo = self.history.pop()
+        move, captured, castling, ep_square, halfmove_clock, key, scores = undo
+        self.material, self.mg_score, self.eg_score, self.phase = scores
+        start = move & 63
+        end = move >> 6 & 63
+        flag = move >> 12
+        bitboards = self.bitboards
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.hash = key
+        self.current_move -= 1
+        changed = (1 << start) | (1 << end)
+        if flag & MoveFlag.PROMOTION:
+            color = bitboards.remove(end) // 6
+            bitboards.put(piece_code(color, PAWN), end)
+        bitboards.move(end, start)
+        color = bitboards.mailbox[start] // 6
+        self.current_turn = COLORS[color]
+        if flag == MoveFlag.CASTLING:
+            rook_start, rook_end = ((start + 3, start + 1) if end > start
+                                    else (start - 4, start - 1))
+            bitboards.move(rook_end, rook_start)
+            changed |= (1 << rook_start) | (1 << rook_end)
+        elif flag == MoveFlag.EN_PASSANT:
+            captured_at = end - 8 if color == WHITE else end + 8
+            bitboards.put(captured, captured_at)
+            changed |= 1 << captured_at
+        elif captured != EMPTY:
+            bitboards.put(captured, end)
+        bitboards.refresh_attacks(changed)
+        return undo
 
     def change_turn(self) -> PieceColor:
-        if self.current_turn is PieceColor.WHITE:
-            self.current_turn = PieceColor.BLACK
-            return PieceColor.BLACK
-        self.current_turn = PieceColor.WHITE
-        return PieceColor.WHITE
+        """Deprecated: move_piece and make_move pass the turn themselves.
+        Kept so that callers of the old move_piece(); change_turn()
+        sequence still work, and does nothing but return the side to
+        move."""
+        warnings.warn("Board.change_turn is deprecated and does nothing, "
+                      "move_piece now passes the turn", DeprecationWarning,
+                      stacklevel=2)
+        return self.current_turn
+
+    def ep_targets(self, color: int) -> int:
+        """Returns the en passant square as a bitboard if color can capture
+        onto it."""
+        if self.ep_square is None:
+            return 0
+        ep = 1 << self.ep_square
+        return ep & (FILE_6 if color == WHITE else FILE_3)
 
     def get_legal_moves(self, position: BoardPosition, shallow=False) -> List[BoardPosition]:
-        moves = []
-        if position.piece.__class__ is Pawn:
-            moves = self.get_pawn_moves(position)
-        elif position.piece.__class__ is Knight:
-            moves = self.get_knight_moves(position)
-        elif position.piece.__class__ is Bishop:
-            moves = self.get_bishop_moves(position)
-        elif position.piece.__class__ is Rook:
-            moves = self.get_rook_moves(position)
-        elif position.piece.__class__ is Queen:
-            moves = self.get_queen_moves(position)
-        elif position.piece.__class__ is King:
-            moves = self.get_king_moves(position, shallow)
+        if not position.piece:
+            return []
         if shallow:
-            return moves
-        return self.validate_moves(position, moves)
-        
+            return self.positions_in(self.pseudo_targets(position.index, True))
+        if position.piece.color is self.current_turn:
+            targets = self.legal_targets_by_square().get(position.index, 0)
+            return self.positions_in(targets)
+        restrictions = self.pin_restrictions(position.piece.color.value)
+        return self.positions_in(self.legal_targets(position.index, restrictions))
+
+    def legal_targets_by_square(self) -> dict:
+        """Returns the legal target bitboard of each of the side to move's
+        pieces that can move, by square index. Worked out once per
+        position and cached until the position changes."""
+        if self.legal_cache is not None and self.legal_cache[0] == self.hash:
+            return self.legal_cache[1]
+        color = self.current_turn.value
+        restrictions = self.pin_restrictions(color)
+        targets = {}
+        for index in iter_bits(self.bitboards.colors[color]):
+            bb = self.legal_targets(index, restrictions)
+            if bb:
+                targets[index] = bb
+        self.legal_cache = (self.hash, targets)
+        return targets
+
+    def legal_moves(self) -> List[int]:
+        """Returns every legal packed move for the side to move."""
+        buffer = new_move_buffer()
+        return buffer[:self.generate_moves(buffer)].tolist()
+
+    def generate_moves(self, buffer: array, count: int = 0) -> int:
+        """Writes every legal packed move for the side to move into buffer
+        from index count onwards and returns the index after the last."""
+        color = self.current_turn.value
+        restrictions = self.pin_restrictions(color)
+        mailbox = self.bitboards.mailbox
+        for start in iter_bits(self.bitboards.colors[color]):
+            targets = self.legal_targets(start, restrictions)
+            kind = mailbox[start] % 6
+            if kind == PAWN:
+                ep = self.ep_targets(color)
+                for end in iter_bits(targets):
+                    move = start | end << 6
+                    if (1 << end) & (FILE_1 | FILE_8):
+                        for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+                            buffer[count] = move | (MoveFlag.PROMOTION | promotion) << 12
+                            count += 1
+                        continue
+                    if (1 << end) & ep:
+                        move |= MoveFlag.EN_PASSANT << 12
+                    elif abs(end - start) == 16:
+                        move |= MoveFlag.DOUBLE_PUSH << 12
+                    buffer[count] = move
+                    count += 1
+            elif kind == KING:
+                for end in iter_bits(targets):
+                    if abs(end - start) == 2:
+                        buffer[count] = start | end << 6 | MoveFlag.CASTLING << 12
+                    else:
+                        buffer[count] = start | end << 6
+                    count += 1
+            else:
+                for end in iter_bits(targets):
+                    buffer[count] = start | end << 6
+                    count += 1
+        return count
+
+    def positions_in(self, bb: int) -> List[BoardPosition]:
+        positions = self.positions
+        return [positions[index] for index in iter_bits(bb)]
+
+    def pseudo_targets(self, index: int, shallow=False) -> int:
+        """Returns the squares the piece on index can reach, ignoring
+        whether its own king is left in check."""
+        code = self.bitboards.mailbox[index]
+        kind = code % 6
+        color = code // 6
+        if kind == PAWN:
+            return self.pawn_targets(index, color)
+        own = self.bitboards.colors[color]
+        occupied = self.bitboards.occupied
+        if kind == KNIGHT:
+            return KNIGHT_ATTACKS[index] & ~own
+        if kind == BISHOP:
+            return bishop_attacks(index, occupied) & ~own
+        if kind == ROOK:
+            return rook_attacks(index, occupied) & ~own
+        if kind == QUEEN:
+            return queen_attacks(index, occupied) & ~own
+        targets = KING_ATTACKS[index] & ~own
+        if shallow:
+            return targets
+        return targets | self.castling_targets(color)
+
+    def pawn_targets(self, index: int, color: int) -> int:
+        bitboards = self.bitboards
+        bb = 1 << index
+        empty = ~bitboards.occupied
+        # Move forward one, then two from the starting file
+        single = pawn_pushes(bb, color) & empty
+        start = FILE_2 if color == WHITE else FILE_7
+        double = pawn_pushes(single, color) & empty if bb & start else 0
+        captures = PAWN_ATTACKS[color][index] & (bitboards.colors[1 - color] |
+                                                 self.ep_targets(color))
+        return single | double | captures
+
+    def castling_targets(self, color: int) -> int:
+        bitboards = self.bitboards
+        if color == WHITE:
+            kingside = CastlingRights.WHITE_KINGSIDE
+            queenside = CastlingRights.WHITE_QUEENSIDE
+            home = 4
+        else:
+            kingside = CastlingRights.BLACK_KINGSIDE
+            queenside = CastlingRights.BLACK_QUEENSIDE
+            home = 60
+        rights = self.castling
+        if (not rights & (kingside | queenside) or
+                bitboards.mailbox[home] != piece_code(color, KING)):
+            return 0
+        attacked = bitboards.attack_map(1 - color)
+        if attacked >> home & 1:
+            return 0
+        rook = piece_code(color, ROOK)
+        occupied = bitboards.occupied
+        targets = 0
+        if (rights & kingside and not occupied & (0b11 << (home + 1)) and
+                bitboards.mailbox[home + 3] == rook and
+                not attacked >> (home + 1) & 1):
+            targets |= 1 << (home + 2)
+        if (rights & queenside and not occupied & (0b111 << (home - 3)) and
+                bitboards.mailbox[home - 4] == rook and
+                not attacked >> (home - 1) & 1):
+            targets |= 1 << (home - 2)
+        return targets
+
     def get_pawn_moves(self, position: BoardPosition) -> List[BoardPosition]:
-        pawn_moves = []
-        pawn = position.piece
-        color = pawn.color
-        direction = pawn.direction
-        rank = position.rank
-        file = position.file
-        square = self.square_at(rank, file+direction)
-        # Move forward one
-        if not square.piece:
-            pawn_moves.append(square)
-        # Move forward two
-        square = self.square_at(rank, file+(2*direction))
-        if not square.piece and pawn.last_moved == -1:
-            pawn_moves.append(square)
-        # Capture to left
-        if rank >= 'b':
-            prev_rank = chr(ord(rank)-1)
-            square = self.square_at(prev_rank, file+direction)
-            if square.piece and square.piece.color is not color:
-                pawn_moves.append(square)
-            # En passant left
-            adj_square = self.square_at(prev_rank, file)
-            if (adj_square.piece and adj_square.piece.__class__ is Pawn and
-                    adj_square.piece.color is not color and
-                    self.current_move - adj_square.piece.last_moved == 1):
-                pawn_moves.append(square)
-        # Capture to right
-        if rank <= 'g':
-            next_rank = chr(ord(rank)+1)
-            square = self.square_at(next_rank, file+direction)
-            if square.piece and square.piece.color is not color:
-                pawn_moves.append(square)
-            # En passant right
-            adj_square = self.square_at(next_rank, file)
-            if (adj_square.piece and adj_square.piece.__class__ is Pawn and
-                    adj_square.piece.color is not color and
-                    self.current_move - adj_square.piece.last_moved == 1):
-                pawn_moves.append(square)
-        return pawn_moves
-    
+        color = position.piece.color.value
+        return self.positions_in(self.pawn_targets(position.index, color))
+
     def get_knight_moves(self, position: BoardPosition) -> List[BoardPosition]:
-        knight_moves = []
-        knight = position.piece
-        color = knight.color
-        rank = position.rank
-        file = position.file
-        # Left two down one, left two up one
-        if ord(rank) >= ord('c'):
-            rank_two_left = chr(ord(rank)-2)
-            if file >= 2:
-                square = self.square_at(rank_two_left, file-1)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-            if file <= 7:
-                square = self.square_at(rank_two_left, file+1)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-        # Left one down two, left one up two
-        if ord(rank) >= ord('b'):
-            rank_one_left = chr(ord(rank)-1)
-            if file >= 3:
-                square = self.square_at(rank_one_left, file-2)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-            if file <= 6:
-                square = self.square_at(rank_one_left, file+2)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-        # Right two down one, right two up one
-        if ord(rank) <= ord('f'):
-            rank_two_right = chr(ord(rank)+2)
-            if file >= 2:
-                square = self.square_at(rank_two_right, file-1)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-            if file <= 7:
-                square = self.square_at(rank_two_right, file+1)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-        # Right one down two, right one up two
-        if ord(rank) <= ord('g'):
-            rank_one_right = chr(ord(rank)+1)
-            if file >= 3:
-                square = self.square_at(rank_one_right, file-2)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-            if file <= 6:
-                square = self.square_at(rank_one_right, file+2)
-                if not square.piece or square.piece.color is not color:
-                    knight_moves.append(square)
-        return knight_moves       
+        return self.positions_in(self.pseudo_targets(position.index))
 
     def get_bishop_moves(self, position: BoardPosition) -> List[BoardPosition]:
-        bishop_moves = []
-        bishop = position.piece
-        color = bishop.color
-        rank = position.rank
-        file = position.file
-        # Up-left diagonal
-        current_rank = chr(ord(rank)-1)
-        current_file = file+1
-        while current_rank >= 'a' and current_file <= 8:
-            square = self.square_at(current_rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                bishop_moves.append(square)
-                break
-            bishop_moves.append(square)
-            current_rank = chr(ord(current_rank)-1)
-            current_file = current_file+1
-        # Down-left diagonal
-        current_rank = chr(ord(rank)-1)
-        current_file = file-1
-        while current_rank >= 'a' and current_file >= 1:
-            square = self.square_at(current_rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                bishop_moves.append(square)
-                break
-            bishop_moves.append(square)
-            current_rank = chr(ord(current_rank)-1)
-            current_file = current_file-1
-        # Down-right diagonal
-        current_rank = chr(ord(rank)+1)
-        current_file = file-1
-        while current_rank <= 'h' and current_file >= 1:
-            square = self.square_at(current_rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                bishop_moves.append(square)
-                break
-            bishop_moves.append(square)
-            current_rank = chr(ord(current_rank)+1)
-            current_file = current_file-1
-        # Up-right diagonal
-        current_rank = chr(ord(rank)+1)
-        current_file = file+1
-        while current_rank <= 'h' and current_file <= 8:
-            square = self.square_at(current_rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                bishop_moves.append(square)
-                break
-            bishop_moves.append(square)
-            current_rank = chr(ord(current_rank)+1)
-            current_file = current_file+1
-        return bishop_moves
+        own = self.bitboards.colors[position.piece.color.value]
+        occupied = self.bitboards.occupied
+        return self.positions_in(bishop_attacks(position.index, occupied) & ~own)
 
     def get_rook_moves(self, position: BoardPosition) -> List[BoardPosition]:
-        rook_moves = []
-        rook = position.piece
-        color = rook.color
-        rank = position.rank
-        file = position.file
-        # Left
-        current_rank = chr(ord(rank)-1)
-        while current_rank >= 'a':
-            square = self.square_at(current_rank, file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                rook_moves.append(square)
-                break
-            rook_moves.append(square)
-            current_rank = chr(ord(current_rank)-1)
-        # Right
-        current_rank = chr(ord(rank)+1)
-        while current_rank <= 'h':
-            square = self.square_at(current_rank, file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                rook_moves.append(square)
-                break
-            rook_moves.append(square)
-            current_rank = chr(ord(current_rank)+1)
-        # Up
-        current_file = file+1
-        while current_file <= 8:
-            square = self.square_at(rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                rook_moves.append(square)
-                break
-            rook_moves.append(square)
-            current_file = current_file+1
-        # Down
-        current_file = file-1
-        while current_file >= 1:
-            square = self.square_at(rank, current_file)
-            if square.piece:
-                if square.piece.color is color:
-                    break
-                rook_moves.append(square)
-                break
-            rook_moves.append(square)
-            current_file = current_file-1
-        return rook_moves
+        own = self.bitboards.colors[position.piece.color.value]
+        occupied = self.bitboards.occupied
+        return self.positions_in(rook_attacks(position.index, occupied) & ~own)
 
     def get_queen_moves(self, position: BoardPosition) -> List[BoardPosition]:
-        bishop_moves = self.get_bishop_moves(position)
-        rook_moves = self.get_rook_moves(position)
-        return bishop_moves + rook_moves
-        
+        own = self.bitboards.colors[position.piece.color.value]
+        occupied = self.bitboards.occupied
+        return self.positions_in(queen_attacks(position.index, occupied) & ~own)
+
     def get_king_moves(self, position: BoardPosition, shallow=False) -> List[BoardPosition]:
-        king_moves = []
-        king = position.piece
-        color = king.color
-        rank = position.rank
-        file = position.file
-        if (ord(rank) >= ord('b')):
-            if file >= 2:
-                square = self.square_at(chr(ord(rank)-1), file-1)
-                if not square.piece or square.piece.color is not color:
-                    king_moves.append(square)
-            if file <= 7:
-                square = self.square_at(chr(ord(rank)-1), file+1)
-                if not square.piece or square.piece.color is not color:
-                    king_moves.append(square)
-            square = self.square_at(chr(ord(rank)-1), file)
-            if not square.piece or square.piece.color is not color:
-                king_moves.append(square)
-        if (ord(rank) <= ord('g')):
-            if file >= 2:
-                square = self.square_at(chr(ord(rank)+1), file-1)
-                if not square.piece or square.piece.color is not color:
-                    king_moves.append(square)
-            if file <= 7:
-                square = self.square_at(chr(ord(rank)+1), file+1)
-                if not square.piece or square.piece.color is not color:
-                    king_moves.append(square)
-            square = self.square_at(chr(ord(rank)+1), file)
-            if not square.piece or square.piece.color is not color:
-                king_moves.append(square)
-        if file >= 2:
-            square = self.square_at(rank, file-1)
-            if not square.piece or square.piece.color is not color:
-                king_moves.append(square)
-        if file <= 7:
-            square = self.square_at(rank, file+1)
-            if not square.piece or square.piece.color is not color:
-                king_moves.append(square)
-        # Castling
-        if shallow:
-            return king_moves
-        # Kingside
-        if king.has_not_moved:
-            bishop = self.square_at('f', file)
-            knight = self.square_at('g', file)
-            rook = self.square_at('h', file)
-            if not (bishop.piece or knight.piece or
-                    not rook.piece.__class__ is Rook or
-                    not rook.piece.has_not_moved or
-                    self.square_attacked(bishop, color) or 
-                    self.square_attacked(knight, color)):
-                king_moves.append(knight)
-            # Queenside
-            queen = self.square_at('d', file)
-            bishop = self.square_at('c', file)
-            knight = self.square_at('b', file)
-            rook = self.square_at('a', file)
-            if not (queen.piece or bishop.piece or knight.piece or
-                    not rook.piece.__class__ is Rook or
-                    not rook.piece.has_not_moved or
-                    self.square_attacked(queen, color) or
-                    self.square_attacked(bishop, color)):
-                king_moves.append(bishop)
-        return king_moves
+        return self.positions_in(self.pseudo_targets(position.index, shallow))
 
     def validate_moves(self, old_square: BoardPosition, potential_moves: List[BoardPosition]) -> List[BoardPosition]:
         """Ensure none of the potential moves leave the player's king in check."""
-        valid_moves = []
-        for new_square in potential_moves:
-            moving_piece = old_square.piece
-            target_piece = new_square.piece
-            new_square.piece = moving_piece
-            old_square.piece = None
-            if not self.king_in_check(self.current_turn):
-                valid_moves.append(new_square)
-            new_square.piece = target_piece
-            old_square.piece = moving_piece
-        return valid_moves
-    
+        color = old_square.piece.color.value
+        legal = self.legal_targets(old_square.index, self.pin_restrictions(color))
+        return [new_square for new_square in potential_moves
+                if legal >> new_square.index & 1]
+
+    def pin_restrictions(self, color: int) -> tuple:
+        """Returns the pieces giving check to color's king, the squares a
+        non-king move must land on to answer that check, and the line each
+        absolutely pinned piece of color is held on."""
+        bitboards = self.bitboards
+        pieces = bitboards.pieces
+        king = bitboards.king_index(color)
+        if king < 0:
+            return 0, FULL, {}
+        base = (1 - color)*6
+        occupied = bitboards.occupied
+        checkers = (bitboards.attackers_to(king, occupied) &
+                    bitboards.colors[1 - color])
+        if not checkers:
+            evasions = FULL
+        elif checkers & (checkers - 1):
+            # Only the king can answer a double check
+            evasions = 0
+        else:
+            evasions = checkers | BETWEEN[king][lsb_index(checkers)]
+        pins = {}
+        snipers = (ROOK_MASKS[king] & (pieces[base + ROOK] |
+                                       pieces[base + QUEEN]) |
+                   BISHOP_MASKS[king] & (pieces[base + BISHOP] |
+                                         pieces[base + QUEEN]))
+        own = bitboards.colors[color]
+        for sniper in iter_bits(snipers):
+            blockers = BETWEEN[king][sniper] & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[lsb_index(blockers)] = LINE[king][sniper]
+        return checkers, evasions, pins
+
+    def legal_targets(self, index: int, restrictions: tuple) -> int:
+        """Returns the legal destinations of the piece on index given the
+        pin_restrictions of its color."""
+        bitboards = self.bitboards
+        code = bitboards.mailbox[index]
+        color = code // 6
+        checkers, evasions, pins = restrictions
+        if code % 6 == KING:
+            targets = KING_ATTACKS[index] & ~bitboards.colors[color]
+            if not checkers:
+                targets |= self.castling_targets(color)
+            # The king must not stay on the ray of a slider it steps away from
+            occupied = bitboards.occupied ^ (1 << index)
+            enemy = bitboards.colors[1 - color]
+            legal = 0
+            for target in iter_bits(targets):
+                if not bitboards.attackers_to(target, occupied) & enemy:
+                    legal |= 1 << target
+            return legal
+        targets = self.pseudo_targets(index)
+        legal = targets & evasions & pins.get(index, FULL)
+        if code % 6 == PAWN:
+            ep = targets & self.ep_targets(color)
+            if ep:
+                legal &= ~ep
+                if self.ep_is_legal(index, lsb_index(ep)):
+                    legal |= ep
+        return legal
+
+    def ep_is_legal(self, start: int, end: int) -> bool:
+        """Returns whether capturing en passant from start to end keeps the
+        king safe, since two pawns leave the king's lines at once."""
+        bitboards = self.bitboards
+        color = bitboards.mailbox[start] // 6
+        if not bitboards.pieces[piece_code(color, KING)]:
+            return True
+        captured = 1 << (end - 8 if color == WHITE else end + 8)
+        occupied = (bitboards.occupied ^ (1 << start) ^ captured) | (1 << end)
+        attackers = bitboards.attackers_to(bitboards.king_index(color), occupied)
+        return not attackers & bitboards.colors[1 - color] & ~captured
+
     def king_in_check(self, color: PieceColor) -> bool:
-        targeted_squares = []
-        king_at = None
-        for rank in self.all_ranks():
-            for file in self.all_files():
-                square = self.square_at(rank, file)
-                if not square.piece:
-                    continue
-                if square.piece.color is color and square.piece.__class__ is King:
-                    king_at = square
-                if square.piece.color is color:
-                    continue
-                targeted_squares += self.get_legal_moves(square, shallow=True)
-        return king_at in targeted_squares
-    
+        bitboards = self.bitboards
+        king = bitboards.pieces[piece_code(color.value, KING)]
+        return bool(bitboards.attack_map(1 - color.value) & king)
+
     def square_attacked(self, square: BoardPosition, defend_color: PieceColor) -> bool:
-        for rank in self.all_ranks():
-            for file in self.all_files():
-                attacking_square = self.square_at(rank, file)
-                if not attacking_square.piece:
-                    continue
-                if attacking_square.piece.color is defend_color:
-                    continue
-                if square in self.get_legal_moves(attacking_square, shallow=True):
-                    return True
-        return False
+        attacked = self.bitboards.attack_map(1 - defend_color.value)
+        return bool(attacked >> square.index & 1)
+
+    def position_keys(self) -> List[int]:
+        """Returns the hashes of the positions since the last irreversible
+        move, oldest first and not counting the current one. These are the
+        only earlier positions the current one can repeat."""
+        keys = self.prior_keys + [undo[5] for undo in self.history]
+        return keys[max(len(keys) - self.halfmove_clock, 0):]
+
+    def repetitions(self) -> int:
+        """Counts the earlier times the current position occurred, looking
+        back no further than the last capture or pawn move."""
+        history = self.history
+        prior = self.prior_keys
+        key = self.hash
+        count = 0
+        # Only positions an even number of plies back have the same side
+        # to move
+        for distance in range(2, self.halfmove_clock + 1, 2):
+            if distance <= len(history):
+                if history[-distance][5] == key:
+                    count += 1
+            elif distance - len(history) <= len(prior):
+                if prior[len(history) - distance] == key:
+                    count += 1
+            else:
+                break
+        return count
+
+    def is_draw(self) -> bool:
+        """Returns whether the game is drawn by threefold repetition or the
+        fifty-move rule, regardless of checkmate."""
+        return self.halfmove_clock >= 100 or self.repetitions() >= 2
 
     def game_status(self) -> GameStatus:
-        for rank in self.all_ranks():
-            for file in self.all_files():
-                square = self.square_at(rank, file)
-                if not square.piece:
-                    continue
-                if square.piece.color is not self.current_turn:
-                    continue
-                if self.get_legal_moves(square):
-                    return GameStatus.PLAY
-        in_check = self.king_in_check(self.current_turn)
-        if in_check:
-            print(f"Checkmate! {self.current_turn} lost.")
-            return GameStatus.CHECKMATE
-        print("Stalemate!")
-        return GameStatus.STALEMATE
-        
+        if not self.legal_targets_by_square():
+            in_check = self.king_in_check(self.current_turn)
+            if in_check:
+                print(f"Checkmate! {self.current_turn} lost.")
+                return GameStatus.CHECKMATE
+            print("Stalemate!")
+            return GameStatus.STALEMATE
+        if self.halfmove_clock >= 100:
+            print("Draw by the fifty-move rule!")
+            return GameStatus.FIFTY_MOVES
+        if self.repetitions() >= 2:
+            print("Draw by threefold repetition!")
+            return GameStatus.REPETITION
+        return GameStatus.PLAY
+
     def reset_board(self) -> None:
+        self.bitboards.clear()
+        self.castling = CastlingRights.ALL
+        self.ep_square = None
+        self.halfmove_clock = 0
+        self.hash = 0
+        self.material = self.mg_score = self.eg_score = self.phase = 0
+        self.history = []
+        self.prior_keys = []
+        self.current_turn = PieceColor.WHITE
+        self.current_move = 0
         for rank in self.all_ranks():
             for file in self.all_files():
                 self.square_at(rank, file).piece = None
         # Pawns
         for rank in self.all_ranks():
-            self.square_at(rank, 2).piece = Pawn(PieceColor.WHITE)
-            self.square_at(rank, 7).piece = Pawn(PieceColor.BLACK)
+            self.place_piece_at(Pawn(PieceColor.WHITE), rank, 2)
+            self.place_piece_at(Pawn(PieceColor.BLACK), rank, 7)
         # Rooks
-        self.square_at('a', 1).piece = Rook(PieceColor.WHITE)
-        self.square_at('h', 1).piece = Rook(PieceColor.WHITE)
-        self.square_at('a', 8).piece = Rook(PieceColor.BLACK)
-        self.square_at('h', 8).piece = Rook(PieceColor.BLACK)
+        self.place_piece_at(Rook(PieceColor.WHITE), 'a', 1)
+        self.place_piece_at(Rook(PieceColor.WHITE), 'h', 1)
+        self.place_piece_at(Rook(PieceColor.BLACK), 'a', 8)
+        self.place_piece_at(Rook(PieceColor.BLACK), 'h', 8)
         # Knights
-        self.square_at('b', 1).piece = Knight(PieceColor.WHITE)
-        self.square_at('g', 1).piece = Knight(PieceColor.WHITE)
-        self.square_at('b', 8).piece = Knight(PieceColor.BLACK)
-        self.square_at('g', 8).piece = Knight(PieceColor.BLACK)
+        self.place_piece_at(Knight(PieceColor.WHITE), 'b', 1)
+        self.place_piece_at(Knight(PieceColor.WHITE), 'g', 1)
+        self.place_piece_at(Knight(PieceColor.BLACK), 'b', 8)
+        self.place_piece_at(Knight(PieceColor.BLACK), 'g', 8)
         # Bishops
-        self.square_at('c', 1).piece = Bishop(PieceColor.WHITE)
-        self.square_at('f', 1).piece = Bishop(PieceColor.WHITE)
-        self.square_at('c', 8).piece = Bishop(PieceColor.BLACK)
-        self.square_at('f', 8).piece = Bishop(PieceColor.BLACK)
+        self.place_piece_at(Bishop(PieceColor.WHITE), 'c', 1)
+        self.place_piece_at(Bishop(PieceColor.WHITE), 'f', 1)
+        self.place_piece_at(Bishop(PieceColor.BLACK), 'c', 8)
+        self.place_piece_at(Bishop(PieceColor.BLACK), 'f', 8)
         # Queens
-        self.square_at('d', 1).piece = Queen(PieceColor.WHITE)
-        self.square_at('d', 8).piece = Queen(PieceColor.BLACK)
+        self.place_piece_at(Queen(PieceColor.WHITE), 'd', 1)
+        self.place_piece_at(Queen(PieceColor.BLACK), 'd', 8)
         # Kings
-        self.square_at('e', 1).piece = King(PieceColor.WHITE)
-        self.square_at('e', 8).piece = King(PieceColor.BLACK)
-
+        self.place_piece_at(King(PieceColor.WHITE), 'e', 1)
+        self.place_piece_at(King(PieceColor.BLACK), 'e', 8)
+        self.hash = compute_hash(self)
@@ -0,0 +1,75 @@
+from array import array
+from src.engine.bitboard import PIECE_CLASSES, KIND_OF, square_name
+
+# Moves are packed into 16 bits: the start square in bits 0-5, the end
+# square in bits 6-11 and a MoveFlag in bits 12-15.
+
+MAX_MOVES = 256
+
+
+class MoveFlag:
+    NONE = 0
+    DOUBLE_PUSH = 1
+    CASTLING = 2
+    EN_PASSANT = 3
+    # Combined with the kind of piece the pawn becomes
+    PROMOTION = 8
+
+
+def new_move_buffer(plies: int = 1) -> array:
+    """Returns a zeroed buffer with room for the moves of plies positions."""
+    return array('H', bytes(2*MAX_MOVES*plies))
+
+
+def encode_move(start: int, end: int, flag: int = MoveFlag.NONE) -> int:
+    return start | end << 6 | flag << 12
+
+
+def move_start(move: int) -> int:
+    return move & 63
+
+
+def move_end(move: int) -> int:
+    return move >> 6 & 63
+
+
+def move_flag(move: int) -> int:
+    return move >> 12
+
+
+def move_promotion(move: int) -> int:
+    """Returns the piece kind a move promotes to, or None."""
+    flag = move >> 12
+    if flag & MoveFlag.PROMOTION:
+        return flag & 7
+    return None
+
+
+def move_to_uci(move: int) -> str:
+    text = square_name(move & 63) + square_name(move >> 6 & 63)
+    promotion = move_promotion(move)
+    if promotion is not None:
+        text += PIECE_CLASSES[promotion].fen_char.lower()
+    return text
+
+
+def move_from_uci(board, text: str) -> int:
+    """Returns the packed move for a UCI string such as 'e2e4' or 'a7a8q'
+    in the board's current position."""
+    start = (int(text[1])-1)*8 + ord(text[0]) - ord('a')
+    end = (int(text[3])-1)*8 + ord(text[2]) - ord('a')
+    promotion = None
+    if len(text) > 4:
+        promotion = next(kind for kind, cls in enumerate(PIECE_CLASSES)
+                         if cls.fen_char.lower() == text[4].lower())
+    return board.encode_move(start, end, promotion)
+
+
+def move_to_positions(board, move: int) -> tuple:
+    """Returns the (start, end) BoardPositions of a move."""
+    return board.positions[move & 63], board.positions[move >> 6 & 63]
+
+
+def move_from_positions(board, old, new, promotion: type = None) -> int:
+    return board.encode_move(old.index, new.index,
+                             None if promotion is None else KIND_OF[promotion])
@@ -0,0 +1,210 @@
+import argparse
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List
+from src.engine.board import Board
+from src.engine.move import MAX_MOVES, new_move_buffer, move_to_uci
+
+
+class PerftPosition:
+    """A position with its known perft node counts, starting at depth 1."""
+    __slots__ = ("name", "fen", "counts")
+
+    def __init__(self, name: str, fen: str, counts: tuple) -> None:
+        self.name = name
+        self.fen = fen
+        self.counts = counts
+
+
+# The standard positions from the Chess Programming Wiki's perft results
+POSITIONS = (
+    PerftPosition("startpos",
+                  "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                  (20, 400, 8902, 197281, 4865609, 119060324)),
+    PerftPosition("kiwipete",
+                  "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                  (48, 2039, 97862, 4085603, 193690690)),
+    PerftPosition("position3",
+                  "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                  (14, 191, 2812, 43238, 674624, 11030083)),
+    PerftPosition("position4",
+                  "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+                  (6, 264, 9467, 422333, 15833292)),
+    PerftPosition("position5",
+                  "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+                  (44, 1486, 62379, 2103487, 89941194)),
+    PerftPosition("position6",
+                  "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+                  (46, 2079, 89890, 3894594, 164075551)),
+)
+
+
+# Perft tasks created per worker process
+TASKS_PER_WORKER = 4
+
+
+class PerftMismatch(Exception):
+    pass
+
+
+def perft(board: Board, depth: int, buffer: array = None, ply: int = 0) -> int:
+    """Counts the leaf nodes of the legal move tree depth plies deep."""
+    if buffer is None:
+        buffer = new_move_buffer(depth + 1)
+    offset = ply*MAX_MOVES
+    count = board.generate_moves(buffer, offset)
+    if depth <= 1:
+        return count - offset if depth == 1 else 1
+    nodes = 0
+    for index in range(offset, count):
+        board.make_move(buffer[index])
+        nodes += perft(board, depth - 1, buffer, ply + 1)
+        board.unmake_move()
+    return nodes
+
+
+def perft_divide(board: Board, depth: int) -> Dict[str, int]:
+    """Returns the perft count below each root move, keyed by UCI string."""
+    buffer = new_move_buffer(depth + 1)
+    count = board.generate_moves(buffer)
+    divide = {}
+    for move in buffer[:count].tolist():
+        board.make_move(move)
+        divide[move_to_uci(move)] = perft(board, depth - 1, buffer, 1)
+        board.unmake_move()
+    return divide
+
+
+def split_perft(board: Board, depth: int, workers: int) -> List[tuple]:
+    """Splits a perft of the board into (moves, depth) tasks, where moves
+    leads from the board's position to the subtree to count. Tasks go a ply
+    deeper until there are enough of them to keep every worker busy while
+    the largest subtrees finish."""
+    buffer = new_move_buffer()
+    count = board.generate_moves(buffer)
+    tasks = [((move,), depth - 1) for move in buffer[:count].tolist()]
+    while tasks and tasks[0][1] > 1 and len(tasks) < workers*TASKS_PER_WORKER:
+        split = []
+        for moves, remaining in tasks:
+            for move in moves:
+                board.make_move(move)
+            count = board.generate_moves(buffer)
+            split.extend((moves + (move,), remaining - 1)
+                         for move in buffer[:count].tolist())
+            for _ in moves:
+                board.unmake_move()
+        tasks = split
+    return tasks
+
+
+def _perft_task(task: tuple) -> int:
+    fen, moves, depth = task
+    board = Board.from_fen(fen)
+    for move in moves:
+        board.make_move(move)
+    return perft(board, depth)
+
+
+def parallel_perft_divide(board: Board, depth: int, workers: int = None,
+                          executor: Executor = None) -> Dict[str, int]:
+    """Like perft_divide, but counts the subtrees in a pool of worker
+    processes, each task being sent as the root FEN and a few packed moves.
+    Uses executor if given, otherwise starts a pool of workers processes
+    (by default one per core)."""
+    if depth < 1:
+        return {}
+    workers = workers or os.cpu_count() or 1
+    fen = board.to_fen()
+    divide = dict.fromkeys(perft_divide(board, 1), 0)
+    tasks = split_perft(board, depth, workers)
+    payloads = [(fen, moves, remaining) for moves, remaining in tasks]
+    if executor is None:
+        with ProcessPoolExecutor(workers) as executor:
+            counts = list(executor.map(_perft_task, payloads))
+    else:
+        counts = executor.map(_perft_task, payloads)
+    for (moves, _), nodes in zip(tasks, counts):
+        divide[move_to_uci(moves[0])] += nodes
+    return divide
+
+
+def parallel_perft(board: Board, depth: int, workers: int = None,
+                   executor: Executor = None) -> int:
+    """Counts the same nodes as perft using a pool of worker processes."""
+    if depth <= 1:
+        return perft(board, depth)
+    return sum(parallel_perft_divide(board, depth, workers, executor).values())
+
+
+def run_benchmark(depth: int, names: list = None, divide=False,
+                  workers: int = 0) -> int:
+    """Runs perft on the standard positions up to depth and prints node
+    counts and speed, splitting the work across workers processes if given.
+    Raises PerftMismatch on a wrong count and returns the total number of
+    nodes."""
+    if workers:
+        with ProcessPoolExecutor(workers) as executor:
+            return _run_benchmark(depth, names, divide, workers, executor)
+    return _run_benchmark(depth, names, divide)
+
+
+def _run_benchmark(depth: int, names: list, divide: bool, workers: int = 0,
+                   executor: Executor = None) -> int:
+    total_nodes = 0
+    total_time = 0.0
+    for position in POSITIONS:
+        if names and position.name not in names:
+            continue
+        board = Board.from_fen(position.fen)
+        for current in range(1, min(depth, len(position.counts)) + 1):
+            started = time.perf_counter()
+            if workers and (divide or current > 1):
+                moves = parallel_perft_divide(board, current, workers, executor)
+                if divide and current == depth:
+                    for move, nodes in moves.items():
+                        print(f"  {move}: {nodes}")
+                nodes = sum(moves.values())
+            elif divide and current == depth:
+                moves = perft_divide(board, current)
+                for move, nodes in moves.items():
+                    print(f"  {move}: {nodes}")
+                nodes = sum(moves.values())
+            else:
+                nodes = perft(board, current)
+            elapsed = time.perf_counter() - started
+            total_nodes += nodes
+            total_time += elapsed
+            expected = position.counts[current - 1]
+            nps = int(nodes / elapsed) if elapsed > 0 else 0
+            print(f"{position.name} depth {current}: {nodes} nodes "
+                  f"{elapsed:.3f}s {nps} nps")
+            if nodes != expected:
+                raise PerftMismatch(f"{position.name} depth {current}: "
+                                    f"expected {expected}, got {nodes}")
+    nps = int(total_nodes / total_time) if total_time > 0 else 0
+    print(f"total: {total_nodes} nodes {total_time:.3f}s {nps} nps")
+    return total_nodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--position", action="append", dest="positions",
+                        choices=[position.name for position in POSITIONS])
+    parser.add_argument("--divide", action="store_true",
+                        help="print the node count below each root move at the last depth")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="split each perft across this many processes")
+    args = parser.parse_args()
+    try:
+        run_benchmark(args.depth, args.positions, args.divide, args.workers)
+    except PerftMismatch as error:
+        print(f"PERFT MISMATCH: {error}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
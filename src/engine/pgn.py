@@ -0,0 +1,283 @@
+import argparse
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, TextIO
+from src.engine.board import Board
+from src.engine.bitboard import PAWN, EMPTY, PIECE_CLASSES, square_name
+from src.engine.move import MoveFlag, move_promotion
+
+# Reads and writes games in Portable Game Notation. Games are read one at a
+# time from any iterable of lines, so files of any size are streamed in
+# constant memory.
+
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+# The Seven Tag Roster, written first and in this order
+ROSTER = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+SAN_CHARS = {cls.fen_char.upper(): kind for kind, cls in enumerate(PIECE_CLASSES)
+             if kind != PAWN}
+SAN_PATTERN = re.compile(r"([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?")
+# Greedy, since some writers do not escape quotes inside values
+HEADER_PATTERN = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+TOKEN_PATTERN = re.compile(r"\{[^}]*\}?|;.*|\$\d+|\(|\)|[^\s{}();]+")
+MOVE_NUMBER = re.compile(r"\d+\.+")
+
+
+class PgnError(ValueError):
+    pass
+
+
+class PgnGame:
+    """A game's tag pairs, its moves in SAN and its result."""
+    __slots__ = ("headers", "sans", "result")
+
+    def __init__(self, headers: Dict[str, str] = None, sans: List[str] = None,
+                 result: str = "*") -> None:
+        self.headers = headers if headers is not None else {}
+        self.sans = sans if sans is not None else []
+        self.result = result
+
+    def board(self) -> Board:
+        """Returns a board set up at the game's starting position."""
+        if "FEN" in self.headers:
+            return Board.from_fen(self.headers["FEN"])
+        return Board()
+
+    def replay(self, board: Board = None) -> Iterator[tuple]:
+        """Yields (board, move) for each move of the game, with the board
+        in the position the packed move is played from, then plays it with
+        make_move. board is set to the starting position first if given,
+        so one Board can be reused across games."""
+        if board is None:
+            board = self.board()
+        elif "FEN" in self.headers:
+            board.set_fen(self.headers["FEN"])
+        else:
+            board.reset_board()
+        for san in self.sans:
+            move = move_from_san(board, san)
+            yield board, move
+            board.make_move(move)
+
+    def moves(self) -> List[int]:
+        return [move for _, move in self.replay()]
+
+
+def move_to_san(board: Board, move: int) -> str:
+    """Returns the Standard Algebraic Notation of a legal packed move in the
+    board's current position."""
+    start = move & 63
+    end = move >> 6 & 63
+    kind = board.bitboards.mailbox[start] % 6
+    if move >> 12 == MoveFlag.CASTLING:
+        san = "O-O" if end > start else "O-O-O"
+    else:
+        capture = (board.bitboards.mailbox[end] != EMPTY or
+                   move >> 12 == MoveFlag.EN_PASSANT)
+        if kind == PAWN:
+            san = square_name(start)[0] + "x" if capture else ""
+        else:
+            san = PIECE_CLASSES[kind].fen_char.upper()
+            # Disambiguate from other pieces of the same kind that can also
+            # reach the target
+            others = [other & 63 for other in board.legal_moves()
+                      if other >> 6 & 63 == end and other & 63 != start and
+                      board.bitboards.mailbox[other & 63] % 6 == kind]
+            if others:
+                if all(other & 7 != start & 7 for other in others):
+                    san += square_name(start)[0]
+                elif all(other >> 3 != start >> 3 for other in others):
+                    san += square_name(start)[1]
+                else:
+                    san += square_name(start)
+            if capture:
+                san += "x"
+        san += square_name(end)
+        promotion = move_promotion(move)
+        if promotion is not None:
+            san += "=" + PIECE_CLASSES[promotion].fen_char.upper()
+    board.make_move(move)
+    if board.king_in_check(board.current_turn):
+        san += "+" if board.legal_moves() else "#"
+    board.unmake_move()
+    return san
+
+
+def move_from_san(board: Board, san: str) -> int:
+    """Returns the legal packed move written san in the board's current
+    position. Raises PgnError if there is no such move or more than one."""
+    text = san.rstrip("+#!?")
+    legal = board.legal_moves()
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kingside = len(text) == 3
+        matches = [move for move in legal if move >> 12 == MoveFlag.CASTLING and
+                   ((move >> 6 & 63) > (move & 63)) == kingside]
+    else:
+        match = SAN_PATTERN.fullmatch(text)
+        if match is None:
+            raise PgnError(f"Invalid SAN {san!r}")
+        piece, from_rank, from_file, target, promotion = match.groups()
+        kind = SAN_CHARS[piece] if piece else PAWN
+        end = (int(target[1]) - 1)*8 + ord(target[0]) - ord('a')
+        promotion = SAN_CHARS[promotion] if promotion else None
+        mailbox = board.bitboards.mailbox
+        matches = [move for move in legal
+                   if move >> 6 & 63 == end and
+                   mailbox[move & 63] % 6 == kind and
+                   move >> 12 != MoveFlag.CASTLING and
+                   move_promotion(move) == promotion and
+                   (from_rank is None or
+                    (move & 7) == ord(from_rank) - ord('a')) and
+                   (from_file is None or (move & 63) >> 3 == int(from_file) - 1)]
+    if len(matches) != 1:
+        raise PgnError(f"{'Ambiguous' if matches else 'Illegal'} move {san!r} "
+                       f"in {board.to_fen()}")
+    return matches[0]
+
+
+def read_games(lines: TextIO) -> Iterator[PgnGame]:
+    """Yields the games in a stream of PGN text one at a time. Comments,
+    NAGs and variations are skipped."""
+    game = None
+    in_comment = False
+    depth = 0
+    for line in lines:
+        if in_comment:
+            if "}" not in line:
+                continue
+            line = line[line.index("}") + 1:]
+            in_comment = False
+        stripped = line.strip()
+        if not stripped or stripped.startswith("%"):
+            continue
+        if stripped.startswith("[") and depth == 0:
+            header = HEADER_PATTERN.match(stripped)
+            if header:
+                if game is not None and game.sans:
+                    # Movetext without a result before the next game
+                    yield game
+                    game = None
+                if game is None:
+                    game = PgnGame()
+                game.headers[header.group(1)] = (header.group(2).replace('\\"', '"')
+                                                 .replace("\\\\", "\\"))
+                continue
+        if game is None:
+            game = PgnGame()
+        for token in TOKEN_PATTERN.findall(line):
+            if token[0] == "{":
+                if not token.endswith("}"):
+                    in_comment = True
+                continue
+            if token[0] in ";$":
+                continue
+            if token == "(":
+                depth += 1
+            elif token == ")":
+                depth = max(depth - 1, 0)
+            elif depth:
+                continue
+            elif token in RESULTS:
+                game.result = token
+                yield game
+                game = None
+                break
+            else:
+                token = MOVE_NUMBER.sub("", token)
+                if token:
+                    game.sans.append(token)
+    if game is not None and (game.sans or game.headers):
+        yield game
+
+
+def game_from_board(board: Board, headers: Dict[str, str] = None) -> PgnGame:
+    """Returns the game of the moves played on a board so far, which are
+    taken back and replayed to write them in SAN."""
+    played = [undo[0] for undo in board.history]
+    for _ in played:
+        board.unmake_move()
+    game = PgnGame(dict(headers or {}))
+    if board.to_fen() != START_FEN:
+        game.headers["SetUp"] = "1"
+        game.headers["FEN"] = board.to_fen()
+    for move in played:
+        game.sans.append(move_to_san(board, move))
+        board.make_move(move)
+    if not board.legal_targets_by_square():
+        if not board.king_in_check(board.current_turn):
+            game.result = "1/2-1/2"
+        elif board.current_turn.value == 0:
+            game.result = "0-1"
+        else:
+            game.result = "1-0"
+    elif board.is_draw():
+        game.result = "1/2-1/2"
+    return game
+
+
+def write_game(stream: TextIO, game: PgnGame, width: int = 80) -> None:
+    """Writes a game as PGN, with the Seven Tag Roster first."""
+    headers = dict.fromkeys(ROSTER, "?")
+    headers["Date"] = "????.??.??"
+    headers.update(game.headers)
+    headers["Result"] = game.result
+    for name, value in headers.items():
+        value = value.replace("\\", "\\\\").replace('"', '\\"')
+        stream.write(f'[{name} "{value}"]\n')
+    stream.write("\n")
+    board = game.board()
+    number = board.current_move // 2 + 1
+    black = board.current_move % 2
+    tokens = []
+    for index, san in enumerate(game.sans):
+        if not black:
+            tokens.append(f"{number}.")
+        elif index == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        number += black
+        black ^= 1
+    tokens.append(game.result)
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            stream.write(line + "\n")
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    stream.write(line + "\n\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay every game in PGN files and report the speed")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--no-replay", action="store_true",
+                        help="only parse the games, without checking the moves")
+    args = parser.parse_args()
+    games = moves = errors = 0
+    board = Board()
+    started = time.perf_counter()
+    for path in args.paths:
+        with open(path, encoding="utf-8", errors="replace") as lines:
+            for game in read_games(lines):
+                games += 1
+                if args.no_replay:
+                    moves += len(game.sans)
+                    continue
+                try:
+                    for _ in game.replay(board):
+                        moves += 1
+                except PgnError as error:
+                    errors += 1
+                    print(f"game {games}: {error}", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    rate = int(moves / elapsed) if elapsed > 0 else 0
+    print(f"{games} games {moves} moves {errors} errors {elapsed:.3f}s "
+          f"{rate} moves/s")
+
+
+if __name__ == "__main__":
+    main()
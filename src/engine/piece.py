@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from enum import Enum
+from src.engine.attacks import QUEEN_MASKS
 
 
 class PieceColor(Enum):
@@ -7,6 +8,14 @@ class PieceColor(Enum):
     BLACK = 1
 
 
+# Squares a queen reaches from each square of an empty board, as
+# (rank, file) tuples.
+QUEEN_TARGETS = tuple(
+    tuple((chr(ord('a') + (index & 7)), (index >> 3) + 1)
+          for index in range(64) if mask >> index & 1)
+    for mask in QUEEN_MASKS)
+
+
 class TextColor:
     BLUE = "\033[94m"
     YELLOW = "\033[93m"
@@ -102,40 +111,7 @@ class Queen(Piece):
     def possible_moves(self, rank: chr, file: int) -> list[tuple]:
         """Returns a list of all valid position tuples that this piece
         can move to."""
-        moves = []
-        r = ord(rank) - 1
-        f = file - 1
-        while r >= ord('a') and f >= 1:
-            moves.append((chr(r), f))
-            r -= 1
-            f -= 1
-        r = ord(rank) + 1
-        f = file - 1
-        while r <= ord('h') and f >= 1:
-            moves.append((chr(r), f))
-            r += 1
-            f -= 1
-        r = ord(rank) + 1
-        f = file + 1
-        while r <= ord('h') and f <= 8:
-            moves.append((chr(r), f))
-            r += 1
-            f += 1
-        r = ord(rank) - 1
-        f = file + 1
-        while r >= ord('a') and f <= 8:
-            moves.append((chr(r), f))
-            r -= 1
-            f += 1
-        for r in range(ord('a'), ord('h')+1):
-            if r == ord(rank):
-                continue
-            moves.append((chr(r), file))
-        for f in range(8):
-            if f+1 == file:
-                continue
-            moves.append((rank, f+1))
-        return moves
+        return list(QUEEN_TARGETS[(file-1)*8 + ord(rank) - ord('a')])
 
     def possible_captures(self, rank: chr, file: int) -> list[tuple]:
         """Returns a list of all valid position tuples that this piece
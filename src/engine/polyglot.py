@@ -0,0 +1,239 @@
+import argparse
+import mmap
+import random
+import struct
+import sys
+from typing import Dict, List
+from src.engine.board import Board
+from src.engine.bitboard import KING, iter_bits
+from src.engine.move import MoveFlag, move_from_uci, move_to_uci
+from src.engine.pgn import PgnError, read_games
+from src.engine.polyglot_keys import (
+    RANDOM64, CASTLING_OFFSET, EP_OFFSET, TURN_OFFSET )
+
+# Polyglot opening books are files of 16-byte big-endian entries sorted by
+# key: the position's Polyglot key, a move, a weight and a learn value.
+# Polyglot moves store the target file and row in bits 0-5, the start file
+# and row in bits 6-11 and the promotion (knight 1 to queen 4) in bits
+# 12-14, which lines up with the packed moves apart from castling, written
+# as the king taking its own rook.
+
+ENTRY = struct.Struct(">QHHI")
+KEY = struct.Struct(">Q")
+
+# Castling as Polyglot writes it, and as a king move
+POLYGLOT_CASTLING = {(4, 7): 6, (4, 0): 2, (60, 63): 62, (60, 56): 58}
+
+# The keys given in the Polyglot book format specification, by the UCI
+# moves played from the start position. Books built elsewhere can only be
+# probed while these match.
+REFERENCE_KEYS = (
+    ("", 0x463b96181691fc9c),
+    ("e2e4", 0x823c9b50fd114196),
+    ("e2e4 d7d5", 0x0756b94461c50fb0),
+    ("e2e4 d7d5 e4e5", 0x662fafb965db29d4),
+    ("e2e4 d7d5 e4e5 f7f5", 0x22a48b5a8e47ff78),
+    ("e2e4 d7d5 e4e5 f7f5 e1e2", 0x652a607ca3f242c1),
+    ("e2e4 d7d5 e4e5 f7f5 e1e2 e8f7", 0x00fdd303c946bdd9),
+    ("a2a4 b7b5 h2h4 b5b4 c2c4", 0x3c8123ea7b067637),
+    ("a2a4 b7b5 h2h4 b5b4 c2c4 b4c3 a1a3", 0x5c3f9b829b279560),
+)
+
+
+def polyglot_key(board: Board) -> int:
+    """Returns the Polyglot key of the board's position. Board only keeps
+    en passant squares a pawn could capture onto, as Polyglot expects."""
+    key = 0
+    pieces = board.bitboards.pieces
+    for code in range(12):
+        # Polyglot numbers pieces black pawn, white pawn, black knight...
+        offset = 64*(2*(code % 6) + (code < 6))
+        for index in iter_bits(pieces[code]):
+            key ^= RANDOM64[offset + index]
+    for bit in range(4):
+        if board.castling >> bit & 1:
+            key ^= RANDOM64[CASTLING_OFFSET + bit]
+    if board.ep_square is not None:
+        key ^= RANDOM64[EP_OFFSET + (board.ep_square & 7)]
+    if board.current_turn.value == 0:
+        key ^= RANDOM64[TURN_OFFSET]
+    return key
+
+
+def check_keys() -> None:
+    """Raises ValueError if polyglot_key differs from the specification's
+    keys, as it would after a change to how positions are hashed."""
+    board = Board()
+    for moves, expected in REFERENCE_KEYS:
+        board.reset_board()
+        for text in moves.split():
+            board.make_move(move_from_uci(board, text))
+        key = polyglot_key(board)
+        if key != expected:
+            raise ValueError(f"Polyglot key after '{moves}': expected "
+                             f"{expected:016x}, got {key:016x}")
+
+
+def from_polyglot_move(board: Board, raw: int) -> int:
+    """Returns the packed move of a Polyglot move in the board's position."""
+    end = raw & 63
+    start = raw >> 6 & 63
+    promotion = raw >> 12 & 7
+    if (board.bitboards.mailbox[start] % 6 == KING and
+            (start, end) in POLYGLOT_CASTLING):
+        end = POLYGLOT_CASTLING[start, end]
+    return board.encode_move(start, end, promotion or None)
+
+
+def to_polyglot_move(move: int) -> int:
+    start = move & 63
+    end = move >> 6 & 63
+    if move >> 12 == MoveFlag.CASTLING:
+        end = (start & 56) | (7 if end > start else 0)
+    raw = end | start << 6
+    if move >> 12 & MoveFlag.PROMOTION:
+        raw |= (move >> 12 & 7) << 12
+    return raw
+
+
+class OpeningBook:
+    """Polyglot opening book, memory-mapped and searched in place."""
+    __slots__ = ("file", "data", "length")
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, "rb")
+        self.length = 0
+        self.data = None
+        size = self.file.seek(0, 2)
+        if size:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.length = size // ENTRY.size
+
+    def __enter__(self) -> "OpeningBook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.data is not None:
+            self.data.close()
+        self.file.close()
+
+    def entries(self, board: Board) -> List[tuple]:
+        """Returns the book's legal (move, weight, learn) entries for the
+        board's position, by packed move."""
+        key = polyglot_key(board)
+        # Binary search for the first entry with the key
+        low, high = 0, self.length
+        while low < high:
+            middle = (low + high) // 2
+            if KEY.unpack_from(self.data, middle*ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        legal = board.legal_moves()
+        entries = []
+        for index in range(low, self.length):
+            entry_key, raw, weight, learn = ENTRY.unpack_from(
+                self.data, index*ENTRY.size)
+            if entry_key != key:
+                break
+            move = from_polyglot_move(board, raw)
+            if move in legal:
+                entries.append((move, weight, learn))
+        return entries
+
+    def choose(self, board: Board, rng: random.Random = random) -> int:
+        """Picks one of the book moves at random, in proportion to their
+        weights. Returns 0 if the position is not in the book."""
+        entries = [entry for entry in self.entries(board) if entry[1]]
+        if not entries:
+            return 0
+        return rng.choices([entry[0] for entry in entries],
+                           [entry[1] for entry in entries])[0]
+
+    def best(self, board: Board) -> int:
+        """Returns the book move with the highest weight, or 0."""
+        entries = self.entries(board)
+        return max(entries, key=lambda entry: entry[1])[0] if entries else 0
+
+
+def book_scores(paths: List[str], plies: int) -> Dict[tuple, int]:
+    """Counts the moves of the first plies plies of the games in PGN files,
+    scoring 2 for a move by the side that won the game and 1 for a draw."""
+    scores = {}
+    board = Board()
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as lines:
+            for game in read_games(lines):
+                points = {"1-0": (2, 0), "0-1": (0, 2),
+                          "1/2-1/2": (1, 1)}.get(game.result)
+                if points is None:
+                    continue
+                try:
+                    for ply, (position, move) in enumerate(game.replay(board)):
+                        if ply >= plies:
+                            break
+                        score = points[position.current_turn.value]
+                        if score:
+                            entry = (polyglot_key(position), to_polyglot_move(move))
+                            scores[entry] = scores.get(entry, 0) + score
+                except PgnError:
+                    continue
+    return scores
+
+
+def build_book(paths: List[str], out: str, plies: int = 24,
+               min_score: int = 1) -> int:
+    """Writes a Polyglot book of the moves played in PGN files and returns
+    the number of entries. Weights are scaled down if they would not fit
+    in 16 bits."""
+    scores = {entry: score for entry, score in book_scores(paths, plies).items()
+              if score >= min_score}
+    scale = max(1, -(-max(scores.values(), default=0) // 0xFFFF))
+    entries = sorted(((key, -score, raw) for (key, raw), score in scores.items()))
+    with open(out, "wb") as stream:
+        for key, score, raw in entries:
+            stream.write(ENTRY.pack(key, raw, max(1, -score // scale), 0))
+    return len(entries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or probe Polyglot books")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build a book from PGN files")
+    build.add_argument("book")
+    build.add_argument("paths", nargs="+")
+    build.add_argument("--plies", type=int, default=24)
+    build.add_argument("--min-score", type=int, default=1)
+    probe = commands.add_parser("probe", help="list a position's book moves")
+    probe.add_argument("book")
+    probe.add_argument("--fen")
+    probe.add_argument("--moves", nargs="*", default=[])
+    commands.add_parser("check", help="check the keys against the "
+                        "Polyglot specification")
+    args = parser.parse_args()
+    if args.command == "check":
+        try:
+            check_keys()
+        except ValueError as error:
+            print(f"KEY MISMATCH: {error}", file=sys.stderr)
+            sys.exit(1)
+        print(f"{len(REFERENCE_KEYS)} keys ok")
+        return
+    if args.command == "build":
+        count = build_book(args.paths, args.book, args.plies, args.min_score)
+        print(f"{count} entries")
+        return
+    board = Board.from_fen(args.fen) if args.fen else Board()
+    for text in args.moves:
+        board.make_move(move_from_uci(board, text))
+    with OpeningBook(args.book) as book:
+        print(f"key {polyglot_key(board):016x}")
+        for move, weight, learn in book.entries(board):
+            print(f"  {move_to_uci(move)}: {weight}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import os
+import time
+from typing import List, Union
+import numpy as np
+from src.engine.board import Board
+from src.engine.move import move_from_uci, move_to_uci
+from src.engine.position_store import PositionStore
+
+# The index of a position store is two more files in its directory: the
+# store's hashes in sorted order, and for each the row of the position it
+# came from. Both are memory-mapped and searched with a binary search, so
+# a query only touches a few pages however large the store is.
+
+HASH_FILE = "index_hash"
+ROW_FILE = "index_row"
+
+
+def build_index(path: str) -> int:
+    """Sorts the hashes of the store at path into its index files,
+    replacing any older index, and returns the number of positions."""
+    store = PositionStore(path)
+    hashes = np.asarray(store["hash"])
+    order = np.argsort(hashes, kind="stable").astype("<u8")
+    hashes[order].astype("<u8").tofile(os.path.join(path, HASH_FILE))
+    order.tofile(os.path.join(path, ROW_FILE))
+    return len(order)
+
+
+class PositionIndex:
+    """Answers which games reached a position and which moves were played
+    from it, using a position store and its index."""
+    __slots__ = ("store", "hashes", "rows")
+
+    def __init__(self, path: str) -> None:
+        self.store = PositionStore(path)
+        self.hashes = np.zeros(0, dtype="<u8")
+        self.rows = np.zeros(0, dtype="<u8")
+        if len(self.store) and os.path.exists(os.path.join(path, HASH_FILE)):
+            self.hashes = np.memmap(os.path.join(path, HASH_FILE),
+                                    dtype="<u8", mode="r")
+            self.rows = np.memmap(os.path.join(path, ROW_FILE),
+                                  dtype="<u8", mode="r")
+        if len(self.hashes) != len(self.store):
+            raise ValueError(f"The index of {path} is missing or out of "
+                             f"date, build it with build_index")
+
+    def find(self, position: Union[Board, str]) -> np.ndarray:
+        """Returns the store rows of a position, given as a Board or a FEN,
+        in the order they were stored."""
+        board = Board.from_fen(position) if isinstance(position, str) else position
+        key = np.uint64(board.hash)
+        start = np.searchsorted(self.hashes, key, side="left")
+        end = np.searchsorted(self.hashes, key, side="right")
+        rows = np.sort(np.asarray(self.rows[start:end]))
+        # Rule out the rare positions that only share the hash
+        same = self.store["occupied"][rows] == np.uint64(board.bitboards.occupied)
+        return rows[same]
+
+    def games(self, position: Union[Board, str]) -> List[tuple]:
+        """Returns (game, ply) for every time a game reached a position."""
+        rows = self.find(position)
+        return list(zip(self.store["game"][rows].tolist(),
+                        self.store["ply"][rows].tolist()))
+
+    def moves(self, position: Union[Board, str]) -> List[tuple]:
+        """Returns (move, count) for the moves played from a position, as
+        UCI strings, most played first."""
+        moves = self.store["move"][self.find(position)]
+        moves, counts = np.unique(moves[moves != 0], return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        return [(move_to_uci(int(moves[index])), int(counts[index]))
+                for index in order]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build or query the position index of a position store")
+    parser.add_argument("store", help="directory of the position store")
+    parser.add_argument("--build", action="store_true",
+                        help="(re)build the index first")
+    parser.add_argument("--fen", help="position to look up, or the start "
+                        "position if not given")
+    parser.add_argument("--moves", nargs="*", default=[],
+                        help="UCI moves played from the position first")
+    args = parser.parse_args()
+    if args.build:
+        started = time.perf_counter()
+        count = build_index(args.store)
+        print(f"indexed {count} positions {time.perf_counter() - started:.3f}s")
+    if args.fen is None and not args.moves and args.build:
+        return
+    board = Board.from_fen(args.fen) if args.fen else Board()
+    for text in args.moves:
+        board.make_move(move_from_uci(board, text))
+    index = PositionIndex(args.store)
+    started = time.perf_counter()
+    games = index.games(board)
+    moves = index.moves(board)
+    elapsed = time.perf_counter() - started
+    print(f"{board.to_fen()}: {len(games)} positions in "
+          f"{len({game for game, _ in games})} games {elapsed*1000:.2f}ms")
+    for move, count in moves:
+        print(f"  {move}: {count}")
+
+
+if __name__ == "__main__":
+    main()
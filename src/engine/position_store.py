@@ -0,0 +1,232 @@
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List
+import numpy as np
+from src.engine.board import Board, fen_of
+from src.engine.bitboard import EMPTY, iter_bits
+from src.engine.pgn import PgnError, PgnGame, read_games
+
+# A position store is a directory holding one file per column, each an
+# array of fixed-width little-endian values with one entry per position, so
+# any column can be opened with numpy.memmap and scanned without copying.
+# Positions are stored in game order, one for every ply of every game
+# including the final position, whose move is 0.
+
+COLUMNS = {
+    # Board.hash, the Zobrist key of the position
+    "hash": ("<u8", ()),
+    # Bitboard of the occupied squares
+    "occupied": ("<u8", ()),
+    # The piece codes on the occupied squares from a1 upwards, two to a
+    # byte with the first in the low nibble
+    "placement": ("u1", (16,)),
+    # 0 for white to move, 1 for black
+    "turn": ("u1", ()),
+    # CastlingRights bits
+    "castling": ("u1", ()),
+    # The en passant square, or NO_EP_SQUARE
+    "ep_square": ("u1", ()),
+    # The packed move played from the position
+    "move": ("<u2", ()),
+    # Index of the game in the order the games were ingested
+    "game": ("<u4", ()),
+    # Plies played in the game before the position
+    "ply": ("<u2", ()),
+}
+NO_EP_SQUARE = 255
+
+# Games sent to a worker at once, and batches waiting per worker at most
+BATCH_GAMES = 256
+PENDING_PER_WORKER = 2
+
+
+def pack_placement(mailbox: list) -> bytes:
+    """Packs the piece codes of the occupied squares, from a1 upwards, two
+    to a byte."""
+    packed = bytearray(16)
+    count = 0
+    for index in range(64):
+        code = mailbox[index]
+        if code != EMPTY:
+            packed[count >> 1] |= code << ((count & 1) << 2)
+            count += 1
+    return bytes(packed)
+
+
+def unpack_placement(occupied: int, placement: bytes) -> list:
+    """Returns the square-to-piece-code list of a packed placement."""
+    mailbox = [EMPTY]*64
+    for count, index in enumerate(iter_bits(occupied)):
+        mailbox[index] = placement[count >> 1] >> ((count & 1) << 2) & 15
+    return mailbox
+
+
+def game_columns(games: List[tuple], first_game: int) -> Dict[str, np.ndarray]:
+    """Replays games, given as (starting FEN or None, SAN moves), and
+    returns the columns of all their positions. Games with an illegal move
+    keep the positions before it."""
+    rows = {name: [] for name in COLUMNS}
+    board = Board()
+    for number, (fen, sans) in enumerate(games, first_game):
+        game = PgnGame({"FEN": fen} if fen else {}, sans)
+        ply = 0
+        moves = game.replay(board)
+        while True:
+            try:
+                move = next(moves)[1]
+            except (StopIteration, PgnError):
+                move = 0
+            mailbox = board.bitboards.mailbox
+            rows["hash"].append(board.hash)
+            rows["occupied"].append(board.bitboards.occupied)
+            rows["placement"].append(pack_placement(mailbox))
+            rows["turn"].append(board.current_turn.value)
+            rows["castling"].append(board.castling)
+            rows["ep_square"].append(NO_EP_SQUARE if board.ep_square is None
+                                     else board.ep_square)
+            rows["move"].append(move)
+            rows["game"].append(number)
+            rows["ply"].append(ply)
+            if not move:
+                break
+            ply += 1
+    columns = {}
+    for name, (dtype, shape) in COLUMNS.items():
+        if name == "placement":
+            data = np.frombuffer(b"".join(rows[name]), dtype=dtype)
+            columns[name] = data.reshape(-1, *shape)
+        else:
+            columns[name] = np.array(rows[name], dtype=dtype)
+    return columns
+
+
+class PositionStore:
+    """Read-only, memory-mapped view of a position store directory."""
+    __slots__ = ("path", "columns", "length")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.columns = {}
+        self.length = 0
+        for name, (dtype, shape) in COLUMNS.items():
+            filename = os.path.join(path, name)
+            width = np.dtype(dtype).itemsize*int(np.prod(shape))
+            length = os.path.getsize(filename) // width
+            if length:
+                self.columns[name] = np.memmap(filename, dtype=dtype, mode="r",
+                                               shape=(length, *shape))
+            else:
+                self.columns[name] = np.zeros((0, *shape), dtype=dtype)
+            self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def fen(self, index: int) -> str:
+        """Returns the FEN of a stored position. The halfmove clock is not
+        stored and the move number comes from the ply."""
+        columns = self.columns
+        mailbox = unpack_placement(int(columns["occupied"][index]),
+                                   columns["placement"][index].tobytes())
+        ep_square = int(columns["ep_square"][index])
+        return fen_of(mailbox, int(columns["turn"][index]),
+                      int(columns["castling"][index]),
+                      None if ep_square == NO_EP_SQUARE else ep_square,
+                      0, int(columns["ply"][index]) // 2 + 1)
+
+    def board(self, index: int) -> Board:
+        return Board.from_fen(self.fen(index))
+
+
+class PositionWriter:
+    """Appends columns of positions to a position store directory."""
+    __slots__ = ("path", "files", "games", "positions")
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.files = {name: open(os.path.join(path, name), "ab")
+                      for name in COLUMNS}
+        # Continue game numbering after the games already stored
+        self.games = 0
+        self.positions = 0
+        games_file = os.path.join(path, "game")
+        size = os.path.getsize(games_file)
+        if size:
+            last = np.memmap(games_file, dtype=COLUMNS["game"][0], mode="r")
+            self.games = int(last[-1]) + 1
+
+    def __enter__(self) -> "PositionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        for name, file in self.files.items():
+            file.write(columns[name].tobytes())
+        self.positions += len(columns["hash"])
+
+    def close(self) -> None:
+        for file in self.files.values():
+            file.close()
+
+
+def game_batches(paths: List[str]) -> Iterator[List[tuple]]:
+    """Streams the games of PGN files in batches of (FEN, SAN moves)."""
+    batch = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as lines:
+            for game in read_games(lines):
+                batch.append((game.headers.get("FEN"), game.sans))
+                if len(batch) == BATCH_GAMES:
+                    yield batch
+                    batch = []
+    if batch:
+        yield batch
+
+
+def ingest(paths: List[str], store: str, workers: int = None) -> tuple:
+    """Replays every game in PGN files across a pool of worker processes
+    and appends their positions to a store, in the order the games appear.
+    Returns the number of games and positions added."""
+    workers = workers or os.cpu_count() or 1
+    with PositionWriter(store) as writer, \
+            ProcessPoolExecutor(workers) as executor:
+        first_game = writer.games
+        pending = deque()
+        for batch in game_batches(paths):
+            pending.append(executor.submit(game_columns, batch, writer.games))
+            writer.games += len(batch)
+            # Write results in order, and stop reading ahead of the workers
+            while pending and (pending[0].done() or
+                               len(pending) >= workers*PENDING_PER_WORKER):
+                writer.write(pending.popleft().result())
+        while pending:
+            writer.write(pending.popleft().result())
+        return writer.games - first_game, writer.positions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay the games in PGN files into a position store")
+    parser.add_argument("store", help="directory of the position store")
+    parser.add_argument("paths", nargs="+", help="PGN files")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    games, positions = ingest(args.paths, args.store, args.workers)
+    elapsed = time.perf_counter() - started
+    rate = int(positions / elapsed) if elapsed > 0 else 0
+    print(f"{games} games {positions} positions {elapsed:.3f}s "
+          f"{rate} positions/s")
+
+
+if __name__ == "__main__":
+    main()
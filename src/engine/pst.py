@@ -0,0 +1,123 @@
+from src.engine.bitboard import PIECE_CLASSES, KING
+
+# Piece-square tables in centipawns, for the middlegame and the endgame,
+# laid out as seen from white's side: the first row is the eighth file.
+# Based on Tomasz Michniewski's simplified evaluation function.
+
+MG_TABLES = (
+    # Pawn
+    (  0,   0,   0,   0,   0,   0,   0,   0,
+      50,  50,  50,  50,  50,  50,  50,  50,
+      10,  10,  20,  30,  30,  20,  10,  10,
+       5,   5,  10,  25,  25,  10,   5,   5,
+       0,   0,   0,  20,  20,   0,   0,   0,
+       5,  -5, -10,   0,   0, -10,  -5,   5,
+       5,  10,  10, -20, -20,  10,  10,   5,
+       0,   0,   0,   0,   0,   0,   0,   0),
+    # Knight
+    (-50, -40, -30, -30, -30, -30, -40, -50,
+     -40, -20,   0,   0,   0,   0, -20, -40,
+     -30,   0,  10,  15,  15,  10,   0, -30,
+     -30,   5,  15,  20,  20,  15,   5, -30,
+     -30,   0,  15,  20,  20,  15,   0, -30,
+     -30,   5,  10,  15,  15,  10,   5, -30,
+     -40, -20,   0,   5,   5,   0, -20, -40,
+     -50, -40, -30, -30, -30, -30, -40, -50),
+    # Bishop
+    (-20, -10, -10, -10, -10, -10, -10, -20,
+     -10,   0,   0,   0,   0,   0,   0, -10,
+     -10,   0,   5,  10,  10,   5,   0, -10,
+     -10,   5,   5,  10,  10,   5,   5, -10,
+     -10,   0,  10,  10,  10,  10,   0, -10,
+     -10,  10,  10,  10,  10,  10,  10, -10,
+     -10,   5,   0,   0,   0,   0,   5, -10,
+     -20, -10, -10, -10, -10, -10, -10, -20),
+    # Rook
+    (  0,   0,   0,   0,   0,   0,   0,   0,
+       5,  10,  10,  10,  10,  10,  10,   5,
+      -5,   0,   0,   0,   0,   0,   0,  -5,
+      -5,   0,   0,   0,   0,   0,   0,  -5,
+      -5,   0,   0,   0,   0,   0,   0,  -5,
+      -5,   0,   0,   0,   0,   0,   0,  -5,
+      -5,   0,   0,   0,   0,   0,   0,  -5,
+       0,   0,   0,   5,   5,   0,   0,   0),
+    # Queen
+    (-20, -10, -10,  -5,  -5, -10, -10, -20,
+     -10,   0,   0,   0,   0,   0,   0, -10,
+     -10,   0,   5,   5,   5,   5,   0, -10,
+      -5,   0,   5,   5,   5,   5,   0,  -5,
+       0,   0,   5,   5,   5,   5,   0,  -5,
+     -10,   5,   5,   5,   5,   5,   0, -10,
+     -10,   0,   5,   0,   0,   0,   0, -10,
+     -20, -10, -10,  -5,  -5, -10, -10, -20),
+    # King
+    (-30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -30, -40, -40, -50, -50, -40, -40, -30,
+     -20, -30, -30, -40, -40, -30, -30, -20,
+     -10, -20, -20, -20, -20, -20, -20, -10,
+      20,  20,   0,   0,   0,   0,  20,  20,
+      20,  30,  10,   0,   0,  10,  30,  20),
+)
+
+EG_TABLES = (
+    # Pawn: push passers on rather than keeping the king's shelter
+    (  0,   0,   0,   0,   0,   0,   0,   0,
+      80,  80,  80,  80,  80,  80,  80,  80,
+      50,  50,  50,  50,  50,  50,  50,  50,
+      30,  30,  30,  30,  30,  30,  30,  30,
+      15,  15,  15,  15,  15,  15,  15,  15,
+       5,   5,   5,   5,   5,   5,   5,   5,
+       0,   0,   0,   0,   0,   0,   0,   0,
+       0,   0,   0,   0,   0,   0,   0,   0),
+    MG_TABLES[1],
+    MG_TABLES[2],
+    MG_TABLES[3],
+    MG_TABLES[4],
+    # King: come to the centre
+    (-50, -40, -30, -20, -20, -30, -40, -50,
+     -30, -20, -10,   0,   0, -10, -20, -30,
+     -30, -10,  20,  30,  30,  20, -10, -30,
+     -30, -10,  30,  40,  40,  30, -10, -30,
+     -30, -10,  30,  40,  40,  30, -10, -30,
+     -30, -10,  20,  30,  30,  20, -10, -30,
+     -30, -30,   0,   0,   0,   0, -30, -30,
+     -50, -30, -30, -30, -30, -30, -30, -50),
+)
+
+# Centipawns from Piece.value. Both sides always have a king, so it counts
+# for nothing.
+MATERIAL = tuple(0 if kind == KING else cls.value*100
+                 for kind, cls in enumerate(PIECE_CLASSES))
+
+# Material of each piece code from white's point of view
+MATERIAL_SCORES = tuple(MATERIAL[code % 6] if code < 6 else -MATERIAL[code % 6]
+                        for code in range(12))
+
+# How much each kind of piece counts towards the middlegame. A position with
+# all the starting pieces has MAX_PHASE, one with only kings and pawns 0.
+PHASE_WEIGHTS = (0, 1, 1, 2, 4, 0)
+MAX_PHASE = 24
+
+
+def _scores(tables: tuple) -> tuple:
+    # White's pieces read the tables upside down, since they list the
+    # eighth file first, and black's pieces count against white
+    return tuple(tuple((MATERIAL[code % 6] + tables[code % 6][index ^ 56])
+                       if code < 6 else
+                       -(MATERIAL[code % 6] + tables[code % 6][index])
+                       for index in range(64))
+                 for code in range(12))
+
+
+# Material plus piece-square score of each piece code on each square, from
+# white's point of view
+MG_SCORES = _scores(MG_TABLES)
+EG_SCORES = _scores(EG_TABLES)
+
+
+def taper(mg: int, eg: int, phase: int) -> int:
+    """Blends middlegame and endgame scores by the game phase."""
+    phase = min(phase, MAX_PHASE)
+    return (mg*phase + eg*(MAX_PHASE - phase)) // MAX_PHASE
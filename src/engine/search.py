@@ -0,0 +1,288 @@
+import time
+from typing import Callable, List
+from src.engine.board import Board
+from src.engine.bitboard import WHITE, EMPTY, PIECE_CLASSES
+from src.engine.pst import taper
+from src.engine.move import MAX_MOVES, MoveFlag, new_move_buffer, move_to_uci
+from src.engine.transposition import TranspositionTable, Bound
+
+MAX_PLY = 64
+MATE = 100000
+INFINITY = 1000000
+
+# Centipawns, from Piece.value. Kings are never captured, so theirs is only
+# used to order captures.
+PIECE_VALUES = tuple(cls.value*100 for cls in PIECE_CLASSES)
+
+
+def evaluate(board: Board) -> int:
+    """Scores a position by material and piece-square tables from the side
+    to move's point of view, using the totals the board keeps up to date
+    as moves are made."""
+    score = taper(board.mg_score, board.eg_score, board.phase)
+    return score if board.current_turn.value == WHITE else -score
+
+
+def to_table(score: int, ply: int) -> int:
+    """Makes mate scores relative to the position being stored rather than
+    the root, so they stay correct when reached along another path."""
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def from_table(score: int, ply: int) -> int:
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+class SearchResult:
+    """Stores the outcome of the deepest completed search iteration."""
+    __slots__ = ("best_move", "score", "depth", "nodes", "time", "pv")
+
+    def __init__(self) -> None:
+        self.best_move = 0
+        self.score = 0
+        self.depth = 0
+        self.nodes = 0
+        self.time = 0.0
+        self.pv = []
+
+    def __str__(self) -> str:
+        if abs(self.score) >= MATE - MAX_PLY:
+            moves = (MATE - abs(self.score) + 1) // 2
+            score = f"mate {moves if self.score > 0 else -moves}"
+        else:
+            score = f"cp {self.score}"
+        pv = " ".join(move_to_uci(move) for move in self.pv)
+        return (f"depth {self.depth} score {score} nodes {self.nodes} "
+                f"nps {self.nps()} time {int(self.time*1000)} pv {pv}")
+
+    def nps(self) -> int:
+        """Returns the nodes searched per second."""
+        if self.time <= 0:
+            return 0
+        return int(self.nodes / self.time)
+
+
+class Search:
+    """Iterative deepening negamax alpha-beta search over a Board, using
+    make_move/unmake_move and a single preallocated move buffer."""
+    __slots__ = ("board", "table", "buffer", "pv_table", "pv_length",
+                 "previous_pv", "nodes", "max_nodes", "deadline", "stopped")
+
+    # Nodes searched between checks of the time and node limits
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, board: Board, table: TranspositionTable = None) -> None:
+        self.board = board
+        self.table = table if table is not None else TranspositionTable()
+        self.buffer = new_move_buffer(MAX_PLY)
+        self.pv_table = [[0]*MAX_PLY for _ in range(MAX_PLY)]
+        self.pv_length = [0]*MAX_PLY
+        self.previous_pv = []
+        self.nodes = 0
+        self.max_nodes = None
+        self.deadline = None
+        self.stopped = False
+
+    def stop(self) -> None:
+        """Asks a running search to return as soon as possible. Safe to
+        call from another thread."""
+        self.stopped = True
+
+    def search(self, depth: int = MAX_PLY, movetime: float = None,
+               nodes: int = None,
+               on_iteration: Callable[[SearchResult], None] = None,
+               start_depth: int = 1) -> SearchResult:
+        """Searches the board's position one ply deeper at a time, from
+        start_depth, until depth is reached, movetime seconds pass, nodes
+        nodes are searched or stop is called. on_iteration is called after
+        every completed iteration."""
+        started = time.perf_counter()
+        self.nodes = 0
+        self.max_nodes = nodes
+        self.deadline = started + movetime if movetime else None
+        self.stopped = False
+        self.previous_pv = []
+        self.table.new_search()
+        result = SearchResult()
+        depth = min(depth, MAX_PLY - 1)
+        for current_depth in range(min(start_depth, depth), depth + 1):
+            score = self.negamax(current_depth, -INFINITY, INFINITY, 0)
+            # An interrupted iteration's score and line are not to be trusted
+            if self.stopped:
+                break
+            result.pv = self.pv_table[0][:self.pv_length[0]]
+            result.best_move = result.pv[0] if result.pv else 0
+            result.score = score
+            result.depth = current_depth
+            result.nodes = self.nodes
+            result.time = time.perf_counter() - started
+            self.previous_pv = result.pv
+            if on_iteration:
+                on_iteration(result)
+            if self.stopped or abs(score) >= MATE - MAX_PLY:
+                break
+        result.nodes = self.nodes
+        result.time = time.perf_counter() - started
+        if not result.best_move:
+            # Even a search stopped at once should be able to play
+            moves = self.board.legal_moves()
+            result.best_move = moves[0] if moves else 0
+        return result
+
+    def search_line(self, line: List[int], depth: int, alpha: int,
+                    beta: int, movetime: float = None) -> int:
+        """Searches the position the moves of line lead to within the
+        window (alpha, beta), as part of a depth plies deep search of the
+        board's position, and returns its score from the point of view of
+        the side to move there. Nodes are added to those already counted,
+        and the principal variation is left for line_pv."""
+        self.deadline = time.perf_counter() + movetime if movetime else None
+        self.max_nodes = None
+        self.stopped = False
+        self.previous_pv = []
+        board = self.board
+        for move in line:
+            board.make_move(move)
+        score = self.negamax(depth - len(line), alpha, beta, len(line))
+        for _ in line:
+            board.unmake_move()
+        return score
+
+    def line_pv(self, line: List[int]) -> List[int]:
+        """Returns line followed by the principal variation found after it
+        by the last search_line."""
+        ply = len(line)
+        return line + self.pv_table[ply][ply:self.pv_length[ply]]
+
+    def check_limits(self) -> None:
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+
+    def ordered_moves(self, count: int, ply: int, noisy=False,
+                      hash_move: int = 0) -> List[int]:
+        """Returns the moves generated for ply with the previous iteration's
+        principal variation move first, then the transposition table's best
+        move, then captures of the most valuable pieces. If noisy, only
+        captures and promotions are returned."""
+        offset = ply*MAX_MOVES
+        moves = self.buffer[offset:count].tolist()
+        mailbox = self.board.bitboards.mailbox
+        if noisy:
+            moves = [move for move in moves
+                     if mailbox[move >> 6 & 63] != EMPTY or
+                     move >> 12 == MoveFlag.EN_PASSANT or
+                     move >> 12 & MoveFlag.PROMOTION]
+        pv_move = self.previous_pv[ply] if ply < len(self.previous_pv) else 0
+
+        def order(move: int) -> int:
+            if move == pv_move:
+                return INFINITY
+            if move == hash_move:
+                return INFINITY - 1
+            victim = mailbox[move >> 6 & 63]
+            if victim != EMPTY:
+                return PIECE_VALUES[victim % 6]*16 - mailbox[move & 63] % 6
+            if move >> 12 & MoveFlag.PROMOTION:
+                return PIECE_VALUES[move >> 12 & 7]
+            return 0
+
+        moves.sort(key=order, reverse=True)
+        return moves
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.pv_length[ply] = ply
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiesce(alpha, beta, ply)
+        self.nodes += 1
+        if self.nodes % self.CHECK_INTERVAL == 0:
+            self.check_limits()
+        board = self.board
+        # A position repeated once in the tree is scored as the draw it can
+        # be forced into
+        if ply and (board.halfmove_clock >= 100 or board.repetitions()):
+            return 0
+        key = board.hash
+        entry = self.table.probe(key)
+        hash_move = 0
+        if entry:
+            hash_move, score, entry_depth, bound = entry
+            if ply and entry_depth >= depth:
+                score = from_table(score, ply)
+                if (bound == Bound.EXACT or
+                        bound == Bound.LOWER and score >= beta or
+                        bound == Bound.UPPER and score <= alpha):
+                    return score
+        count = board.generate_moves(self.buffer, ply*MAX_MOVES)
+        if count == ply*MAX_MOVES:
+            if board.king_in_check(board.current_turn):
+                return -MATE + ply
+            return 0
+        original_alpha = alpha
+        best = -INFINITY
+        best_move = 0
+        pv_table = self.pv_table
+        for move in self.ordered_moves(count, ply, hash_move=hash_move):
+            board.make_move(move)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    line = pv_table[ply]
+                    child = pv_table[ply + 1]
+                    line[ply] = move
+                    for index in range(ply + 1, self.pv_length[ply + 1]):
+                        line[index] = child[index]
+                    self.pv_length[ply] = max(self.pv_length[ply + 1], ply + 1)
+                    if score >= beta:
+                        break
+        if best >= beta:
+            bound = Bound.LOWER
+        elif best > original_alpha:
+            bound = Bound.EXACT
+        else:
+            bound = Bound.UPPER
+            best_move = 0
+        self.table.store(key, best_move, to_table(best, ply), depth, bound)
+        return best
+
+    def quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        """Searches captures and promotions only, until the position is
+        quiet enough for evaluate to be trusted."""
+        self.nodes += 1
+        if self.nodes % self.CHECK_INTERVAL == 0:
+            self.check_limits()
+        board = self.board
+        best = evaluate(board)
+        if best >= beta or ply >= MAX_PLY - 1:
+            return best
+        if best > alpha:
+            alpha = best
+        count = board.generate_moves(self.buffer, ply*MAX_MOVES)
+        for move in self.ordered_moves(count, ply, noisy=True):
+            board.make_move(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return best
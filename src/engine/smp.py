@@ -0,0 +1,277 @@
+import atexit
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.engine.board import Board
+from typing import List
+from src.engine.bitboard import EMPTY
+from src.engine.search import (
+    Search, SearchResult, MAX_PLY, MATE, INFINITY, PIECE_VALUES )
+from src.engine.transposition import SharedTranspositionTable
+
+# The shared table this worker process is attached to
+_worker_table = None
+
+
+class SharedSearch(Search):
+    """Search that also stops once the stop flag of its shared table is
+    set by another process."""
+    __slots__ = ()
+
+    def check_limits(self) -> None:
+        super().check_limits()
+        if self.table.stop_requested():
+            self.stopped = True
+
+
+def _attach(name: str) -> SharedTranspositionTable:
+    global _worker_table
+    if _worker_table is None or _worker_table.name != name:
+        if _worker_table is not None:
+            _worker_table.close()
+        _worker_table = SharedTranspositionTable(name=name)
+    return _worker_table
+
+
+@atexit.register
+def _detach() -> None:
+    # Release the views into the shared memory before the interpreter tears
+    # down, which otherwise fails to close memory with views still exported
+    if _worker_table is not None:
+        _worker_table.close()
+
+
+def _smp_task(task: tuple) -> tuple:
+    name, fen, keys, index, depth, deadline, nodes = task
+    board = Board.from_fen(fen)
+    board.prior_keys = keys
+    search = SharedSearch(board, _attach(name))
+    movetime = None
+    if deadline is not None:
+        movetime = max(deadline - time.time(), 0.001)
+    if index == 0:
+        result = search.search(depth, movetime, nodes)
+        return (result.best_move, result.score, result.depth, result.nodes,
+                result.pv)
+    # Helpers search until the main search stops them, with every other
+    # one starting a ply deeper so that they spread over the depths
+    result = search.search(MAX_PLY, movetime, start_depth=1 + index % 2)
+    return 0, 0, 0, result.nodes, []
+
+
+def _split_task(task: tuple) -> tuple:
+    name, fen, keys, line, depth, alpha, beta, deadline = task
+    if deadline is not None and time.time() >= deadline:
+        return 0, 0, True, []
+    table = _attach(name)
+    table.new_search()
+    board = Board.from_fen(fen)
+    board.prior_keys = keys
+    search = SharedSearch(board, table)
+    movetime = None
+    if deadline is not None:
+        movetime = max(deadline - time.time(), 0.001)
+    score = search.search_line(line, depth, alpha, beta, movetime)
+    return score, search.nodes, search.stopped, search.line_pv(line)
+
+
+class LazySMP:
+    """Lazy SMP search: a pool of worker processes all search the same
+    position and share one transposition table in shared memory.
+
+    The first worker's search gives the result. The others search the same
+    tree at staggered depths until it finishes, and what they store in the
+    table lets it cut off and order moves sooner."""
+    __slots__ = ("table", "workers", "executor")
+
+    def __init__(self, workers: int = None, size_mb: int = 16) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.table = SharedTranspositionTable(size_mb)
+        # Workers are spawned rather than forked, since searches are often
+        # started from a thread while another holds locks (such as the one
+        # on sys.stdin) that a forked child would inherit held
+        self.executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def search(self, board: Board, depth: int = MAX_PLY,
+               movetime: float = None, nodes: int = None) -> SearchResult:
+        """Searches the board's position with every worker. The limits
+        are those of Search.search, with nodes only counting the first
+        worker's nodes."""
+        started = time.perf_counter()
+        table = self.table
+        table.new_search()
+        table.set_stop(False)
+        deadline = time.time() + movetime if movetime else None
+        futures = [self.executor.submit(
+                       _smp_task, (table.name, board.to_fen(),
+                                   board.position_keys(), index, depth,
+                                   deadline, nodes))
+                   for index in range(self.workers)]
+        try:
+            best_move, score, depth, _, pv = futures[0].result()
+        finally:
+            table.set_stop(True)
+        result = SearchResult()
+        result.best_move = best_move
+        result.score = score
+        result.depth = depth
+        result.pv = pv
+        result.nodes = sum(future.result()[3] for future in futures)
+        result.time = time.perf_counter() - started
+        return result
+
+    def stop(self) -> None:
+        """Asks a running search to return as soon as possible. Safe to
+        call from another thread."""
+        self.table.set_stop(True)
+
+    def resize(self, size_mb: int) -> None:
+        self.table.resize(size_mb)
+
+    def close(self) -> None:
+        """Shuts down the workers and frees the shared table."""
+        self.executor.shutdown(cancel_futures=True)
+        self.table.close()
+
+
+class ParallelSearch(LazySMP):
+    """Fixed-depth search that splits the tree between a pool of worker
+    processes sharing one transposition table in shared memory, reusing
+    the pool and table handling of LazySMP.
+
+    Each iteration is a principal variation search whose first SPLIT_PLY
+    plies are run here. At those nodes the first move is searched first
+    with a full window, split further in the same way. The other moves
+    are then sent to the workers all at once, only to test with a null
+    window that they are no better. The few that are get searched again
+    with a full window, again split. Tasks are sent as the root FEN, the
+    hashes of the positions it could repeat, the line of moves to search
+    after it, the depth and the window."""
+    __slots__ = ()
+
+    # Plies at which nodes are split between the workers
+    SPLIT_PLY = 2
+
+    def search(self, board: Board, depth: int = MAX_PLY,
+               movetime: float = None) -> SearchResult:
+        """Searches the board's position one ply deeper at a time until
+        depth is reached, movetime seconds pass or stop is called."""
+        started = time.perf_counter()
+        table = self.table
+        table.set_stop(False)
+        deadline = time.time() + movetime if movetime else None
+        # The first iteration only orders the root moves for the second
+        result = Search(board, table).search(1, movetime)
+        nodes = result.nodes
+        moves = board.legal_moves()
+        for current in range(2, min(depth, MAX_PLY - 1) + 1):
+            if (len(moves) <= 1 or abs(result.score) >= MATE - MAX_PLY or
+                    table.stop_requested() or
+                    deadline is not None and time.time() >= deadline):
+                break
+            moves.remove(result.best_move)
+            moves.insert(0, result.best_move)
+            split = ParallelIteration(self, board, current, deadline)
+            score, pv = split.search([], -INFINITY, INFINITY, moves)
+            nodes += split.nodes
+            if split.stopped:
+                break
+            result.best_move = pv[0]
+            result.score = score
+            result.depth = current
+            result.pv = pv
+        result.nodes = nodes
+        result.time = time.perf_counter() - started
+        return result
+
+
+class ParallelIteration:
+    """One iteration of a ParallelSearch, at a fixed depth."""
+    __slots__ = ("parent", "board", "depth", "deadline", "fen", "keys",
+                 "nodes", "stopped")
+
+    def __init__(self, parent: ParallelSearch, board: Board, depth: int,
+                 deadline: float) -> None:
+        self.parent = parent
+        self.board = board
+        self.depth = depth
+        self.deadline = deadline
+        self.fen = board.to_fen()
+        self.keys = board.position_keys()
+        self.nodes = 0
+        self.stopped = False
+
+    def run(self, windows: List[tuple]) -> List[tuple]:
+        """Searches (line, alpha, beta) windows in the workers and returns
+        (score, pv) for each."""
+        if self.stopped or not windows:
+            return []
+        name = self.parent.table.name
+        tasks = [(name, self.fen, self.keys, line, self.depth, alpha, beta,
+                  self.deadline) for line, alpha, beta in windows]
+        outcomes = list(self.parent.executor.map(_split_task, tasks))
+        self.nodes += sum(outcome[1] for outcome in outcomes)
+        self.stopped = any(outcome[2] for outcome in outcomes)
+        return [(outcome[0], outcome[3]) for outcome in outcomes]
+
+    def children(self, line: List[int]) -> List[int]:
+        """Returns the legal moves after line, or None if the position is
+        drawn by repetition or the fifty-move rule. The table's best move
+        comes first, then captures of the most valuable pieces."""
+        board = self.board
+        for move in line:
+            board.make_move(move)
+        moves = None
+        if not (board.halfmove_clock >= 100 or board.repetitions()):
+            moves = board.legal_moves()
+            entry = self.parent.table.probe(board.hash)
+            hash_move = entry[0] if entry else 0
+            mailbox = board.bitboards.mailbox
+            moves.sort(key=lambda move: INFINITY if move == hash_move else
+                       PIECE_VALUES[mailbox[move >> 6 & 63] % 6]
+                       if mailbox[move >> 6 & 63] != EMPTY else 0,
+                       reverse=True)
+        for _ in line:
+            board.unmake_move()
+        return moves
+
+    def search(self, line: List[int], alpha: int, beta: int,
+               moves: List[int] = None) -> tuple:
+        """Returns the score of the position after line within the window
+        (alpha, beta), from the point of view of the side to move there,
+        and its principal variation. moves are the moves to search there
+        in order, by default children's."""
+        split_ply = min(self.parent.SPLIT_PLY, self.depth)
+        if moves is None and len(line) < split_ply:
+            moves = self.children(line)
+            if moves is None:
+                return 0, line
+        if not moves:
+            # Past the split plies, or mate or stalemate: left to a worker
+            outcomes = self.run([(line, alpha, beta)])
+            return outcomes[0] if outcomes else (0, line)
+        score, pv = self.search(line + [moves[0]], -beta, -alpha)
+        score = -score
+        if score >= beta or self.stopped:
+            return score, pv
+        alpha = max(alpha, score)
+        # The other moves only need to show they are no better than the
+        # first, and the few that are get searched again. A failed test
+        # only bounds the move's score, so it is searched again even if
+        # alpha has been raised since.
+        bound = alpha
+        outcomes = self.run([(line + [move], -bound - 1, -bound)
+                             for move in moves[1:]])
+        for move, (test, _) in zip(moves[1:], outcomes):
+            if -test <= bound or self.stopped:
+                continue
+            child, child_pv = self.search(line + [move], -beta, -alpha)
+            if -child > score:
+                score = -child
+                pv = child_pv
+                alpha = max(alpha, score)
+                if score >= beta:
+                    break
+        return score, pv
@@ -0,0 +1,177 @@
+from array import array
+from multiprocessing import shared_memory
+
+# Each entry is two 64-bit words: the position's hash XORed with its packed
+# data, and the data. An entry half overwritten by another process then no
+# longer matches its key, so tables can be shared without locks. Data holds
+# the best move in bits 0-15, the depth in bits 16-23, the Bound in bits
+# 24-25, the search generation in bits 26-31 and the score, offset to be
+# unsigned, in bits 32-63.
+
+SCORE_OFFSET = 1 << 31
+
+
+class Bound:
+    EMPTY = 0
+    EXACT = 1
+    LOWER = 2
+    UPPER = 3
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results, stored in two flat
+    preallocated arrays.
+
+    Entries come in buckets of two. The first slot keeps the deepest
+    result (unless it is from an older search) and the second always takes
+    whatever the first slot turned down."""
+    __slots__ = ("keys", "data", "mask", "generation")
+
+    ENTRY_BYTES = 16
+    BUCKET_SIZE = 2
+
+    def __init__(self, size_mb: int = 16) -> None:
+        self.resize(size_mb)
+
+    def resize(self, size_mb: int) -> None:
+        """Reallocates the table to the largest power-of-two number of
+        buckets that fits in size_mb megabytes, dropping every entry."""
+        buckets = max(1, (size_mb << 20) // (self.ENTRY_BYTES*self.BUCKET_SIZE))
+        buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = buckets - 1
+        self.keys = array('Q', bytes(8*buckets*self.BUCKET_SIZE))
+        self.data = array('Q', bytes(8*buckets*self.BUCKET_SIZE))
+        self.generation = 0
+
+    def clear(self) -> None:
+        self.keys = array('Q', bytes(8*len(self.keys)))
+        self.data = array('Q', bytes(8*len(self.data)))
+        self.generation = 0
+
+    def size_mb(self) -> int:
+        return len(self.keys)*self.ENTRY_BYTES >> 20
+
+    def new_search(self) -> None:
+        """Marks the entries stored so far as coming from an older search,
+        so they give way to new results."""
+        self.generation = (self.generation + 1) & 63
+
+    def probe(self, key: int) -> tuple:
+        """Returns the (move, score, depth, bound) stored for key, or None."""
+        index = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data[index]
+        if keys[index] ^ data != key:
+            data = self.data[index + 1]
+            if keys[index + 1] ^ data != key:
+                return None
+        return (data & 0xFFFF, (data >> 32) - SCORE_OFFSET,
+                data >> 16 & 0xFF, data >> 24 & 3)
+
+    def store(self, key: int, move: int, score: int, depth: int,
+              bound: int) -> None:
+        index = (key & self.mask) << 1
+        keys = self.keys
+        data = self.data
+        old = data[index]
+        if (keys[index] ^ old != key and old >> 26 & 63 == self.generation and
+                old >> 16 & 0xFF > depth):
+            index += 1
+            old = data[index]
+        if not move and keys[index] ^ old == key:
+            # Keep the best move found by an earlier search of this position
+            move = old & 0xFFFF
+        entry = (move | depth << 16 | bound << 24 | self.generation << 26 |
+                 (score + SCORE_OFFSET) << 32)
+        data[index] = entry
+        keys[index] = key ^ entry
+
+    def hashfull(self) -> int:
+        """Returns how many of the first thousand entries are from the
+        current search, as reported by UCI engines."""
+        sample = min(1000, len(self.data))
+        used = sum(1 for index in range(sample)
+                   if self.data[index] >> 24 & 3 and
+                   self.data[index] >> 26 & 63 == self.generation)
+        return used*1000 // sample
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """Transposition table kept in shared memory, so that searches in
+    several processes can use it at once.
+
+    The table that creates the memory owns it and frees it in close. Other
+    processes attach to it with SharedTranspositionTable(name=table.name).
+    Besides the entries, the memory holds a few words shared by everyone
+    using the table: the search generation and a stop flag."""
+    __slots__ = ("memory", "owner", "header")
+
+    HEADER_WORDS = 2
+    GENERATION = 0
+    STOP = 1
+
+    def __init__(self, size_mb: int = 16, name: str = None) -> None:
+        self.memory = None
+        self.owner = name is None
+        if self.owner:
+            self.resize(size_mb)
+        else:
+            self.attach(shared_memory.SharedMemory(name))
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def attach(self, memory: shared_memory.SharedMemory) -> None:
+        self.memory = memory
+        words = memory.buf.cast('Q')
+        entries = (len(words) - self.HEADER_WORDS) // 2
+        self.header = words[:self.HEADER_WORDS]
+        self.keys = words[self.HEADER_WORDS:self.HEADER_WORDS + entries]
+        self.data = words[self.HEADER_WORDS + entries:]
+        self.mask = entries // self.BUCKET_SIZE - 1
+        self.generation = self.header[self.GENERATION]
+
+    def resize(self, size_mb: int) -> None:
+        """Replaces the shared memory with a new block, which has a new
+        name for other processes to attach to."""
+        if not self.owner:
+            raise ValueError("Only the table that created the memory can resize it")
+        buckets = max(1, (size_mb << 20) // (self.ENTRY_BYTES*self.BUCKET_SIZE))
+        buckets = 1 << (buckets.bit_length() - 1)
+        self.close()
+        self.attach(shared_memory.SharedMemory(
+            create=True, size=8*self.HEADER_WORDS +
+            buckets*self.BUCKET_SIZE*self.ENTRY_BYTES))
+
+    def clear(self) -> None:
+        self.memory.buf[:] = bytes(self.memory.size)
+        self.generation = 0
+
+    def new_search(self) -> None:
+        """Starts a new generation if this table owns the memory. Attached
+        tables take on the owner's current generation instead."""
+        if self.owner:
+            super().new_search()
+            self.header[self.GENERATION] = self.generation
+        else:
+            self.generation = self.header[self.GENERATION]
+
+    def set_stop(self, stop: bool) -> None:
+        self.header[self.STOP] = int(stop)
+
+    def stop_requested(self) -> bool:
+        return bool(self.header[self.STOP])
+
+    def close(self) -> None:
+        """Detaches from the shared memory, freeing it if this table owns
+        it."""
+        if self.memory is None:
+            return
+        self.header.release()
+        self.keys.release()
+        self.data.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+        self.memory = None
@@ -0,0 +1,247 @@
+import os
+import sys
+import threading
+import time
+from typing import List, TextIO
+from src.engine.board import Board
+from src.engine.move import move_from_uci, move_to_uci
+from src.engine.polyglot import OpeningBook
+from src.engine.search import Search, SearchResult, MAX_PLY
+from src.engine.smp import LazySMP
+from src.engine.transposition import TranspositionTable
+
+
+class UciEngine:
+    """Universal Chess Interface front end for the engine, reading commands
+    from input and writing replies to output. Searches run on a background
+    thread so that stop and isready are answered while searching."""
+    __slots__ = ("board", "input", "output", "hash_mb", "threads", "table",
+                 "smp", "searcher", "search_thread", "infinite", "stopped",
+                 "book")
+
+    NAME = "ChessBee"
+    AUTHOR = "the ChessBee developers"
+    MAX_HASH_MB = 4096
+    # Milliseconds kept back from every move for communication delays
+    MOVE_OVERHEAD = 50
+    # Seconds stop waits for the search to send its best move
+    STOP_TIMEOUT = 5.0
+
+    def __init__(self, input: TextIO = sys.stdin,
+                 output: TextIO = sys.stdout) -> None:
+        self.board = Board()
+        self.input = input
+        self.output = output
+        self.hash_mb = 16
+        self.threads = 1
+        self.table = TranspositionTable(self.hash_mb)
+        self.smp = None
+        self.searcher = None
+        self.search_thread = None
+        self.infinite = False
+        self.stopped = threading.Event()
+        self.book = None
+
+    def send(self, line: str) -> None:
+        self.output.write(line + "\n")
+        self.output.flush()
+
+    def run(self) -> None:
+        """Handles commands until quit or the end of input."""
+        try:
+            for line in self.input:
+                tokens = line.split()
+                if not tokens:
+                    continue
+                if tokens[0] == "quit":
+                    break
+                self.handle(tokens)
+        finally:
+            self.stop()
+            if self.smp:
+                self.smp.close()
+            if self.book:
+                self.book.close()
+
+    def handle(self, tokens: List[str]) -> None:
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {self.NAME}")
+            self.send(f"id author {self.AUTHOR}")
+            self.send(f"option name Hash type spin default 16 min 1 "
+                      f"max {self.MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 "
+                      f"max {os.cpu_count() or 1}")
+            self.send("option name BookFile type string default <empty>")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stop()
+            self.board.reset_board()
+            self.current_table().clear()
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "position":
+            self.stop()
+            self.set_position(args)
+        elif command == "go":
+            self.stop()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "d":
+            self.send(str(self.board))
+            self.send(f"Fen: {self.board.to_fen()}")
+        else:
+            self.send(f"info string unknown command {command}")
+
+    def current_table(self) -> TranspositionTable:
+        return self.smp.table if self.smp else self.table
+
+    def set_option(self, args: List[str]) -> None:
+        """Handles 'setoption name <name> value <value>'."""
+        if "name" not in args or "value" not in args:
+            return
+        name = " ".join(args[args.index("name") + 1:args.index("value")])
+        value = " ".join(args[args.index("value") + 1:])
+        if name.lower() == "bookfile":
+            self.set_book(value)
+            return
+        try:
+            number = int(value)
+        except ValueError:
+            self.send(f"info string invalid value {value!r} for {name}")
+            return
+        self.stop()
+        if name.lower() == "hash":
+            self.hash_mb = max(1, min(number, self.MAX_HASH_MB))
+            # Both tables, so that changing Threads keeps the size
+            self.table.resize(self.hash_mb)
+            if self.smp:
+                self.smp.resize(self.hash_mb)
+        elif name.lower() == "threads":
+            self.threads = max(1, number)
+            if self.smp:
+                self.smp.close()
+                self.smp = None
+            if self.threads > 1:
+                self.smp = LazySMP(self.threads, self.hash_mb)
+        else:
+            self.send(f"info string unknown option {name}")
+
+    def set_book(self, path: str) -> None:
+        """Opens the Polyglot book that go plays from while it has moves,
+        or closes it for an empty path."""
+        if self.book:
+            self.book.close()
+            self.book = None
+        if path and path != "<empty>":
+            try:
+                self.book = OpeningBook(path)
+            except OSError as error:
+                self.send(f"info string cannot open book {path}: {error}")
+
+    def set_position(self, args: List[str]) -> None:
+        """Handles 'position [startpos | fen <fen>] [moves <move>...]'."""
+        moves = []
+        if "moves" in args:
+            moves = args[args.index("moves") + 1:]
+            args = args[:args.index("moves")]
+        try:
+            if args and args[0] == "fen":
+                self.board.set_fen(" ".join(args[1:]))
+            else:
+                self.board.reset_board()
+            for text in moves:
+                move = move_from_uci(self.board, text)
+                if move not in self.board.legal_moves():
+                    raise ValueError(f"Illegal move {text}")
+                self.board.make_move(move)
+        except (ValueError, IndexError, StopIteration) as error:
+            self.send(f"info string {error or 'invalid position'}")
+
+    def go(self, args: List[str]) -> None:
+        """Handles 'go' with depth, nodes, movetime, wtime, btime, winc,
+        binc, movestogo and infinite, starting the search on a thread."""
+        limits = {}
+        for index, token in enumerate(args[:-1]):
+            if args[index + 1].lstrip("-").isdigit():
+                limits[token] = int(args[index + 1])
+        self.infinite = "infinite" in args
+        if self.book and not self.infinite:
+            move = self.book.choose(self.board)
+            if move:
+                self.send(f"bestmove {move_to_uci(move)}")
+                return
+        depth = limits.get("depth", MAX_PLY)
+        movetime = None
+        if "movetime" in limits:
+            movetime = limits["movetime"] / 1000
+        elif not self.infinite:
+            movetime = self.time_for_move(limits)
+        self.stopped.clear()
+        # The search gets its own board, which stays untouched even if a
+        # search that stop gave up on is still running when the next
+        # position arrives
+        board = Board.from_fen(self.board.to_fen())
+        board.prior_keys = self.board.position_keys()
+        self.searcher = self.smp or Search(board, self.table)
+        self.search_thread = threading.Thread(
+            target=self.search,
+            args=(board, depth, movetime, limits.get("nodes")), daemon=True)
+        self.search_thread.start()
+
+    def time_for_move(self, limits: dict) -> float:
+        """Returns the seconds to spend on this move out of the clock, or
+        None if there is no clock."""
+        white = self.board.current_turn.value == 0
+        remaining = limits.get("wtime" if white else "btime")
+        if remaining is None:
+            return None
+        increment = limits.get("winc" if white else "binc", 0)
+        moves_to_go = limits.get("movestogo", 30)
+        budget = remaining / max(moves_to_go, 1) + increment*3 // 4
+        budget = min(budget, remaining // 2) - self.MOVE_OVERHEAD
+        return max(budget, 10) / 1000
+
+    def search(self, board: Board, depth: int, movetime: float,
+               nodes: int) -> None:
+        if self.smp:
+            result = self.smp.search(board, depth, movetime, nodes)
+            self.send_info(result)
+        else:
+            result = self.searcher.search(depth, movetime, nodes,
+                                          on_iteration=self.send_info)
+        if self.infinite:
+            # The best move may only be sent once the GUI says stop
+            self.stopped.wait()
+        self.send(f"bestmove {move_to_uci(result.best_move)}"
+                  if result.best_move else "bestmove 0000")
+
+    def send_info(self, result: SearchResult) -> None:
+        self.send(f"info {result} hashfull {self.current_table().hashfull()}")
+
+    def stop(self) -> None:
+        """Stops a running search and waits for it to send its best move,
+        giving up after STOP_TIMEOUT seconds so that quit always returns."""
+        if self.search_thread is None:
+            return
+        self.stopped.set()
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+        # Repeated in case the search had not started yet and cleared it
+        while self.search_thread.is_alive() and time.monotonic() < deadline:
+            self.searcher.stop()
+            self.search_thread.join(0.01)
+        if self.search_thread.is_alive():
+            self.send("info string the search did not stop in time")
+        self.search_thread = None
+        self.searcher = None
+
+
+def main() -> None:
+    UciEngine().run()
+
+
+if __name__ == "__main__":
+    main()
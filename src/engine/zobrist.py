@@ -0,0 +1,40 @@
+from random import Random
+from src.engine.bitboard import EMPTY
+
+# Fixed seed so hashes are stable between runs and processes
+_random = Random(0x0C4E55BEE)
+
+# Indexed by piece code, then square
+PIECE_KEYS = tuple(tuple(_random.getrandbits(64) for _ in range(64))
+                   for _ in range(12))
+SIDE_KEY = _random.getrandbits(64)
+_CASTLING_RIGHT_KEYS = tuple(_random.getrandbits(64) for _ in range(4))
+
+
+def _castling_key(rights: int) -> int:
+    key = 0
+    for bit in range(4):
+        if rights >> bit & 1:
+            key ^= _CASTLING_RIGHT_KEYS[bit]
+    return key
+
+
+# Indexed by the whole set of CastlingRights bits
+CASTLING_KEYS = tuple(_castling_key(rights) for rights in range(16))
+# Indexed by the rank (column) of the en passant square
+EP_KEYS = tuple(_random.getrandbits(64) for _ in range(8))
+
+
+def compute_hash(board) -> int:
+    """Computes a board's Zobrist key from scratch."""
+    key = 0
+    mailbox = board.bitboards.mailbox
+    for index in range(64):
+        if mailbox[index] != EMPTY:
+            key ^= PIECE_KEYS[mailbox[index]][index]
+    if board.current_turn.value:
+        key ^= SIDE_KEY
+    key ^= CASTLING_KEYS[board.castling]
+    if board.ep_square is not None:
+        key ^= EP_KEYS[board.ep_square & 7]
+    return key
@@ -13,7 +13,7 @@ class SquareColor:
 
 class SquareComponent:
     __slots__ = ("position", "rank", "file", "dark", "selected",
-                 "highlighted", "rect", "xmin", "ymin")
+                 "highlighted", "rect", "xmin", "ymin", "drawn")
 
     def __init__(self, boardPosition: BoardPosition):
         self.position = boardPosition
@@ -28,6 +28,19 @@ class SquareComponent:
         self.xmin = Window.BOARD_XMIN + size*(ord(self.rank)-ord('a'))
         self.ymin = Window.BOARD_YMIN + size*(8-self.file)
         self.rect = pygame.Rect(self.xmin, self.ymin, size, size)
+        # What the square looked like when last drawn, None if never drawn
+        self.drawn = None
+
+    def state(self) -> tuple:
+        piece = self.position.piece
+        if piece is None:
+            return self.color(), None, None
+        return self.color(), piece.__class__, piece.color
+
+    def draw(self, window: pygame.Surface) -> None:
+        pygame.draw.rect(window, self.color(), self.rect)
+        drawPiece(self.position.piece, window, self.xmin, self.ymin)
+        self.drawn = self.state()
 
     def color(self) -> SquareColor:
         if self.selected:
@@ -42,8 +55,10 @@ class SquareComponent:
 
 
 class BoardComponent:
+    """Draws the board, redrawing only the squares that changed since they
+    were last drawn over a cached background of the labels."""
     __slots__ = ("board", "window", "squares", "selected_square_pos",
-                 "rank_labels")
+                 "rank_labels", "background", "full_redraw")
 
     def __init__(self, window: pygame.Surface):
         self.window = window
@@ -54,15 +69,44 @@ class BoardComponent:
                                    for rank in self.board.squares)
         self.rank_labels = RankFileLabels(self)
         self.selected_square_pos = None
-        
-    def draw(self) -> None:
+        self.background = pygame.Surface(window.get_size())
+        self.background.fill(Color.BLACK)
+        self.rank_labels.draw(self.background)
+        self.full_redraw = True
+
+    def invalidate(self) -> None:
+        """Makes the next draw repaint the whole window, e.g. after it was
+        exposed."""
+        self.full_redraw = True
+
+    def draw(self) -> list:
+        """Draws what changed since the last draw and returns the changed
+        rects, for pygame.display.update."""
+        if self.full_redraw:
+            self.full_redraw = False
+            self.window.blit(self.background, (0, 0))
+            for rank in self.squares:
+                for square in rank:
+                    square.draw(self.window)
+            return [self.window.get_rect()]
+        dirty = []
         for rank in self.squares:
             for square in rank:
-                pygame.draw.rect(self.window, square.color(), square.rect)
-                drawPiece(square.position.piece, self.window,
-                          square.xmin, square.ymin)
-        self.rank_labels.draw()
+                if square.drawn != square.state():
+                    square.draw(self.window)
+                    dirty.append(square.rect)
+        return dirty
                 
+    def square_at_point(self, point: tuple) -> SquareComponent:
+        """Returns the square under a window coordinate, or None if it is
+        off the board."""
+        size = Window.SQUARE_SIZE
+        rank = int((point[0] - Window.BOARD_XMIN) // size)
+        file = 7 - int((point[1] - Window.BOARD_YMIN) // size)
+        if 0 <= rank < 8 and 0 <= file < 8:
+            return self.squares[file][rank]
+        return None
+
     def select_square_at(self, rank: chr, file: int) -> None:
         self.selected_square_pos = self.board.square_at(rank, file)
         rank = ord(rank) - ord('a')
@@ -105,9 +149,10 @@ class RankFileLabels:
             file_label = Label(self.window, str(file), xcenter, ycenter, font_size)
             self.file_labels.append(file_label)
 
-    def draw(self):
+    def draw(self, surface: pygame.Surface = None):
+        surface = surface or self.window
         for rank_label in self.rank_labels:
-            self.window.blit(rank_label.image, rank_label.rect)
+            surface.blit(rank_label.image, rank_label.rect)
         for file_label in self.file_labels:
-            self.window.blit(file_label.image, file_label.rect)
+            surface.blit(file_label.image, file_label.rect)
 
@@ -2,12 +2,20 @@ import pygame
 from src.ui.color import Color
 
 class Text:
+    DEFAULT_SIZE = 20
+    DEFAULT_FAMILY = "Helvetica"
+    # Fonts already made, by (family, size). SysFont searches the system's
+    # fonts, so each one is only created on first use.
+    FONTS = {}
 
-    def font(size: int, family="Helvetica") -> pygame.font.Font:
-        pygame.font.init()
-        return pygame.font.SysFont(family, size)
-    
-    DEFAULT_FONT = font(20)
+    @staticmethod
+    def font(size: int = DEFAULT_SIZE,
+             family: str = DEFAULT_FAMILY) -> pygame.font.Font:
+        font = Text.FONTS.get((family, size))
+        if font is None:
+            pygame.font.init()
+            font = Text.FONTS[family, size] = pygame.font.SysFont(family, size)
+        return font
 
 
 class Label:
@@ -25,4 +33,3 @@ class Label:
 
     def draw(self):
         self.window.blit(self.image, self.rect)
-
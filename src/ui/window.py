@@ -3,7 +3,8 @@ class Window:
     WIDTH = 600
     HEIGHT = 600
     SIZE = (WIDTH, HEIGHT)
-    FPS = 60
+    # Longest time in milliseconds the main loop waits for an event
+    EVENT_TIMEOUT = 500
     TITLE = "ChessBee Engine"
     SQUARE_SIZE = 60
     HIGHLIGHT_SIZE = SQUARE_SIZE/3